@@ -19,12 +19,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-r0vi+og_f63$z3lm)x(tf@!-%6d44(-*ds395)#i8g6br4n^dg'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-r0vi+og_f63$z3lm)x(tf@!-%6d44(-*ds395)#i8g6br4n^dg'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = bool(int(os.environ.get('DEBUG', 1)))
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
 
 # Application definition
 
@@ -35,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -43,15 +49,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the other middleware
+    'core.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.replicas.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Adds the query count and the statements run more than once to responses,
+# see core.instrumentation
+QUERY_DEBUG_HEADERS = bool(int(os.environ.get('QUERY_DEBUG_HEADERS', DEBUG)))
+
+# Directory where each worker saves its metrics, so /api/metrics/ reports the
+# sum over all the workers instead of the one answering. Emptied by gunicorn
+# on start. Snapshots are saved at most every METRICS_FLUSH_INTERVAL seconds.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -75,16 +94,110 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# With DB_POOL, connections are borrowed from a process wide pool for the
+# length of a request (see core.db.pool). Without it, each thread keeps its
+# own connection open for DB_CONN_MAX_AGE seconds.
+DB_POOL = bool(int(os.environ.get('DB_POOL', 1)))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'core.db.backends.postgresql_pool' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+        ),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'MAX_AGE': int(os.environ.get('DB_POOL_MAX_AGE', 3600)),
+            'CHECK_INTERVAL': int(os.environ.get('DB_POOL_CHECK_INTERVAL', 30)),
+        },
     }
 }
 
+# Read replicas as comma separated hosts sharing the primary's credentials.
+# Safe requests of the API read from them, see core.db.replicas.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+
+# round_robin, or least_lag to pick the replica furthest along
+REPLICA_SELECTION = os.environ.get('DB_REPLICA_SELECTION', 'round_robin')
+# Seconds a user reads from the primary after writing, so they see their own
+# writes. least_lag skips replicas further behind than REPLICA_MAX_LAG.
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+REPLICA_MAX_LAG = float(
+    os.environ.get('DB_REPLICA_MAX_LAG', REPLICA_STICKY_SECONDS)
+)
+# Seconds a measured replica lag is reused before checking it again
+REPLICA_LAG_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 2)
+)
+# Cache holding the users pinned to the primary, it has to be shared by
+# every process serving the API for the sticky window to hold
+REPLICA_CACHE_ALIAS = 'default'
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# The local memory default is per process. Deployments with several workers
+# use a shared cache, like memcached with
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+
+# New passwords are hashed with the first hasher, the others only verify
+# older hashes, which are upgraded on the next successful login
+PASSWORD_HASHERS = [
+    'core.hashers.TunedArgon2PasswordHasher',
+    'core.hashers.OffloadedPBKDF2PasswordHasher',
+]
+
+# Argon2 costs: passes, memory in KiB and threads per hash. Changing them
+# upgrades the stored hashes on login like changing the hasher does.
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+
+# At most PASSWORD_HASHING_WORKERS hashes compute at once per process, 0
+# for no limit; the request thread waits for its hash either way. Up to
+# PASSWORD_HASHING_QUEUE more wait for PASSWORD_HASHING_TIMEOUT seconds
+# before the request gets a 503.
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)
+)
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 64))
+PASSWORD_HASHING_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASHING_TIMEOUT', 5)
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -125,9 +238,69 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Recipe images are processed by a pool of IMAGE_PROCESSING_WORKERS threads
+# per process, 0 processes them in the request once its transaction commits
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+RECIPE_IMAGE_MAX_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_SIZE', 20 * 1024 * 1024))
+
+# Local directory holding recipe images until they are processed, kept out
+# of MEDIA_ROOT so the metadata of raw uploads is never served
+PENDING_IMAGE_DIR = os.environ.get('PENDING_IMAGE_DIR', '/vol/web/pending')
+
+# Local directory holding recipe images while they are uploaded in chunks,
+# kept out of MEDIA_ROOT so partial files are never served
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', '/vol/web/uploads')
+# Seconds after which an unfinished chunked upload is abandoned, the
+# expire_uploads command then deletes it with its partial file
+CHUNKED_UPLOAD_EXPIRY = int(os.environ.get('CHUNKED_UPLOAD_EXPIRY', 24 * 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
+}
+
+# List tags, ingredients and recipes from values() instead of serializer
+# instances, see recipe.fast
+API_FAST_LISTS = bool(int(os.environ.get('API_FAST_LISTS', 1)))
+
+# PAGE_SIZE is used by the per-view cursor paginators in recipe.pagination
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
+# Cache used by core.authentication.CachedTokenAuthentication
+TOKEN_AUTH_CACHE_ALIAS = 'default'
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+# Upper bound of the above with a local memory cache, which revocations only
+# clear in the process handling them
+TOKEN_AUTH_LOCAL_CACHE_TIMEOUT = int(
+    os.environ.get('TOKEN_AUTH_LOCAL_CACHE_TIMEOUT', 5)
+)
+
+# Cache of list responses used by recipe.cache.CachedListMixin
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 600))
+# Cache responses in a local memory cache too, only consistent with a single
+# process since other workers would not see the invalidations
+RESPONSE_CACHE_LOCAL = bool(int(os.environ.get('RESPONSE_CACHE_LOCAL', 0)))
+
+# Text search configuration used to index and search recipes
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'english')
+
+# Upper bound for the page_size query parameter of list endpoints
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+
+# Maximum number of items accepted by the bulk endpoints, and the number of
+# rows they write per INSERT/UPDATE statement
+API_MAX_BULK_SIZE = int(os.environ.get('API_MAX_BULK_SIZE', 10000))
+API_BULK_BATCH_SIZE = 1000
+
+# Maximum number of changed objects returned by one delta sync request
+SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', 1000))
@@ -18,8 +18,18 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView
+
 urlpatterns = [
-                  path('admin/', admin.site.urls),
-                  path('api/user/', include('user.urls')),
-                  path('api/recipe/', include('recipe.urls')),
-              ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('admin/', admin.site.urls),
+    path('api/user/', include('user.urls')),
+    path('api/recipe/', include('recipe.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+]
+
+if settings.DEBUG:
+    # Only for runserver, in production the proxy serves media and static
+    # files straight from the volume (see proxy/default.conf)
+    urlpatterns += static(
+        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+    )
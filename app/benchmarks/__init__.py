@@ -0,0 +1,7 @@
+"""
+Benchmark scenarios run with `python manage.py benchmark <scenario>`
+
+Each module exposing a `run(command, options)` function is a scenario and
+may define `add_arguments(parser)` for its own options. Scenarios run
+against a throwaway test database created by the command.
+"""
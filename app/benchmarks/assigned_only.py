@@ -0,0 +1,65 @@
+"""Compare the DISTINCT join, EXISTS and recipe_count assigned_only filters"""
+from django.core.management.base import CommandError
+from django.db.models import Exists, OuterRef
+
+from benchmarks.utils import seed_dataset, explain, timed
+from core.models import Ingredient, Recipe
+
+INGREDIENTS_PER_RECIPE = 5
+
+
+def add_arguments(parser):
+    parser.add_argument('--links', type=int, nargs='+',
+                        default=[10000, 100000],
+                        help='Recipe to ingredient link rows to seed for '
+                             'each run')
+    parser.add_argument('--ingredients', type=int, default=200,
+                        help='Ingredients shared by the seeded recipes')
+
+
+def distinct_queryset(user):
+    """The assigned_only filter as implemented with a join and DISTINCT"""
+    return Ingredient.objects.filter(recipe__isnull=False) \
+        .filter(user=user).order_by('-name', 'id').distinct()
+
+
+def exists_queryset(user):
+    """The assigned_only filter as implemented with an EXISTS semi-join"""
+    links = Recipe.ingredients.through.objects.filter(
+        ingredient=OuterRef('pk')
+    )
+    return Ingredient.objects.filter(user=user).filter(Exists(links)) \
+        .order_by('-name', 'id')
+
+
+def counter_queryset(user):
+    """The assigned_only filter as implemented with recipe_count"""
+    return Ingredient.objects.filter(user=user, recipe_count__gt=0) \
+        .order_by('-name', 'id')
+
+
+def run(command, options):
+    for links in options['links']:
+        command.stdout.write(f'Seeding {links} link rows...')
+        user = seed_dataset(
+            users=1,
+            recipes=links // INGREDIENTS_PER_RECIPE,
+            ingredients=options['ingredients'],
+            ingredients_per_recipe=INGREDIENTS_PER_RECIPE,
+            email_prefix=f'links{links}-',
+        )[0]
+
+        querysets = (
+            ('DISTINCT', distinct_queryset(user)),
+            ('EXISTS', exists_queryset(user)),
+            ('recipe_count', counter_queryset(user)),
+        )
+        if len({tuple(queryset) for _, queryset in querysets}) != 1:
+            raise CommandError(f'Results differ at {links} link rows')
+
+        for label, queryset in querysets:
+            duration = timed(lambda: list(queryset.all()))
+            command.stdout.write(f'{links} links, {label}: {duration:.2f} ms')
+            if options['verbosity'] > 1:
+                sql, params = queryset.query.sql_with_params()
+                command.stdout.write(explain(sql, params, analyze=True))
@@ -0,0 +1,62 @@
+"""Compare importing recipes one POST at a time with the bulk endpoint"""
+import time
+
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import seed_dataset
+from core.models import Tag, Ingredient
+
+
+def add_arguments(parser):
+    parser.add_argument('--recipes', type=int, default=2000,
+                        help='Recipes to import in each mode')
+    parser.add_argument('--batch', type=int, default=1000,
+                        help='Recipes per bulk request')
+
+
+def payloads(user, count):
+    """Return recipe payloads referencing the user's tags and ingredients"""
+    tags = list(Tag.objects.filter(user=user).values_list('pk', flat=True))
+    ingredients = list(
+        Ingredient.objects.filter(user=user).values_list('pk', flat=True)
+    )
+    return [{
+        'title': f'Imported recipe {i}',
+        'time_minutes': 30,
+        'price': '12.50',
+        'tags': tags[i % len(tags):][:3],
+        'ingredients': ingredients[i % len(ingredients):][:5],
+    } for i in range(count)]
+
+
+def run(command, options):
+    single_user, bulk_user = seed_dataset(users=2, recipes=0)
+    count = options['recipes']
+
+    client = APIClient()
+    client.force_authenticate(single_user)
+    url = reverse('recipe:recipe-list')
+    start = time.perf_counter()
+    for payload in payloads(single_user, count):
+        res = client.post(url, payload, format='json')
+        if res.status_code != 201:
+            raise CommandError(f'Single import failed: {res.data}')
+    single = time.perf_counter() - start
+
+    client.force_authenticate(bulk_user)
+    url = reverse('recipe:recipe-bulk')
+    items = payloads(bulk_user, count)
+    start = time.perf_counter()
+    for offset in range(0, count, options['batch']):
+        res = client.post(
+            url, items[offset:offset + options['batch']], format='json'
+        )
+        if res.status_code != 201:
+            raise CommandError(f'Bulk import failed: {res.data}')
+    bulk = time.perf_counter() - start
+
+    command.stdout.write(f'single: {count / single:.0f} recipes/s')
+    command.stdout.write(f'bulk: {count / bulk:.0f} recipes/s')
+    command.stdout.write(f'speedup: {single / bulk:.1f}x')
@@ -0,0 +1,57 @@
+"""Compare the per request cost of new, persistent and pooled connections"""
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+from benchmarks.utils import seed_dataset, timed
+from core.db.backends.postgresql_pool.base import (
+    DatabaseWrapper as PooledDatabaseWrapper, close_pools
+)
+
+# The page query of the recipe list endpoint
+QUERY = (
+    'SELECT id, title, time_minutes, price, link FROM core_recipe '
+    'WHERE user_id = %s ORDER BY id DESC LIMIT 50'
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=500,
+                        help='Simulated requests in each mode')
+    parser.add_argument('--host',
+                        help='Connect over this host instead of DB_HOST, '
+                             'e.g. 127.0.0.1 to include TCP setup')
+
+
+def request(wrapper, user_id, close):
+    """Run one request's query, closing the connection like Django does"""
+    with wrapper.cursor() as cursor:
+        cursor.execute(QUERY, [user_id])
+        cursor.fetchall()
+    if close:
+        wrapper.close()
+
+
+def run(command, options):
+    command.stdout.write('Seeding dataset...')
+    user = seed_dataset(users=1, recipes=100)[0]
+    settings_dict = dict(connection.settings_dict, CONN_MAX_AGE=0)
+    if options['host']:
+        settings_dict['HOST'] = options['host']
+
+    modes = (
+        ('new connection', DatabaseWrapper(settings_dict), True),
+        ('persistent', DatabaseWrapper(settings_dict), False),
+        ('pooled', PooledDatabaseWrapper(settings_dict), True),
+    )
+    results = {}
+    for name, wrapper, close in modes:
+        request(wrapper, user.pk, close)
+        results[name] = timed(
+            lambda: request(wrapper, user.pk, close), options['requests']
+        )
+        wrapper.close()
+        command.stdout.write(f'{name}: {results[name]:.3f} ms per request')
+    close_pools(settings_dict['NAME'])
+
+    saved = results['new connection'] - results['pooled']
+    command.stdout.write(f'pooling saves {saved:.3f} ms per request')
@@ -0,0 +1,62 @@
+"""Compare the serializer and values() paths of the recipe list endpoint"""
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from benchmarks.utils import seed_dataset, timed
+from core.cache import get_response_cache
+from core.renderers import FastJSONRenderer
+from recipe.pagination import BaseCursorPagination
+from recipe.views import RecipeViewSet
+
+MODES = (
+    ('serializer + JSONRenderer', False, JSONRenderer),
+    ('values() + JSONRenderer', True, JSONRenderer),
+    ('values() + orjson', True, FastJSONRenderer),
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help='Recipes per page')
+    parser.add_argument('--repeat', type=int, default=5)
+
+
+def run(command, options):
+    command.stdout.write('Seeding dataset...')
+    user = seed_dataset(users=1, recipes=max(options['sizes']))[0]
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('recipe:recipe-list')
+
+    def get(size):
+        # Every request has to build its response
+        get_response_cache().clear()
+        return client.get(url, {'page_size': size}).content
+
+    with patch.object(BaseCursorPagination, 'max_page_size',
+                      max(options['sizes'])):
+        for size in options['sizes']:
+            command.stdout.write(f'\n{size} recipes per page')
+            results = {}
+            bodies = {}
+            for name, fast, renderer in MODES:
+                with override_settings(API_FAST_LISTS=fast), patch.object(
+                    RecipeViewSet, 'renderer_classes', (renderer,)
+                ):
+                    bodies[name] = get(size)
+                    results[name] = timed(
+                        lambda: get(size), options['repeat']
+                    )
+            baseline = results[MODES[0][0]]
+            for name, ms in results.items():
+                command.stdout.write(
+                    f'{name}: {ms:.1f} ms, {baseline / ms:.1f}x'
+                )
+            identical = len(set(bodies.values())) == 1
+            command.stdout.write(
+                f'identical bodies: {"yes" if identical else "NO"}'
+            )
@@ -0,0 +1,154 @@
+"""Load test the main endpoints under runserver and gunicorn"""
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from benchmarks.utils import seed_dataset
+from core.models import Recipe
+
+ENDPOINTS = (
+    ('recipes', '/api/recipe/recipes/'),
+    ('recipe detail', '/api/recipe/recipes/{recipe}/'),
+    ('tags', '/api/recipe/tags/?assigned_only=1'),
+    ('search', '/api/recipe/recipes/?search=curry'),
+)
+
+MODES = ('runserver', 'gunicorn')
+
+
+def server_command(mode, address):
+    """Return the command line starting the server of a serving mode"""
+    if mode == 'runserver':
+        return [
+            sys.executable, 'manage.py', 'runserver', '--noreload', address
+        ]
+    return [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+        '--bind', address, 'app.wsgi'
+    ]
+
+
+def add_arguments(parser):
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Concurrent clients, each with its own user')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Seconds spent on each endpoint')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--recipes', type=int, default=200,
+                        help='Recipes per user')
+
+
+def start_server(mode, port):
+    """Start a server on the benchmark database and wait until it answers"""
+    env = dict(
+        os.environ,
+        DB_NAME=connection.settings_dict['NAME'],
+        DEBUG='0',
+        ALLOWED_HOSTS='127.0.0.1',
+        GUNICORN_ACCESSLOG='',
+    )
+    server = subprocess.Popen(
+        server_command(mode, f'127.0.0.1:{port}'),
+        cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError(f'{mode} exited with code {server.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/recipe/')
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise CommandError(f'{mode} did not start within 30 seconds')
+
+
+def client(port, path, token, deadline, latencies, errors):
+    """Send requests over one keep-alive connection until the deadline"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Authorization': f'Token {token}'}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            errors.append(path)
+            continue
+        if response.status != 200:
+            errors.append(path)
+        else:
+            latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+
+
+def load(port, path, clients, duration):
+    """Return the latencies and errors of concurrent clients on an endpoint"""
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client, args=(
+            port, path.format(recipe=recipe), token, deadline, latencies,
+            errors
+        ))
+        for token, recipe in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run(command, options):
+    command.stdout.write('Seeding dataset...')
+    users = seed_dataset(
+        users=options['concurrency'], recipes=options['recipes']
+    )
+    tokens = Token.objects.bulk_create([
+        Token(user=user, key=Token.generate_key()) for user in users
+    ])
+    clients = [
+        (token.key, Recipe.objects.filter(user=token.user).first().pk)
+        for token in tokens
+    ]
+
+    for mode in options['modes']:
+        command.stdout.write(f'\n{mode}')
+        server = start_server(mode, options['port'])
+        try:
+            for name, path in ENDPOINTS:
+                latencies, errors = load(
+                    options['port'], path, clients, options['duration']
+                )
+                if len(latencies) < 2:
+                    command.stdout.write(f'{name}: {len(errors)} errors')
+                    continue
+                p50 = statistics.median(latencies)
+                p99 = statistics.quantiles(latencies, n=100)[98]
+                rate = len(latencies) / options['duration']
+                command.stdout.write(
+                    f'{name}: {rate:.0f} req/s, '
+                    f'p50 {p50:.1f} ms, p99 {p99:.1f} ms, {len(errors)} errors'
+                )
+        finally:
+            server.terminate()
+            server.wait()
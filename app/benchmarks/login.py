@@ -0,0 +1,108 @@
+"""Measure password hashing cost and login throughput per core"""
+import os
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, check_password, make_password
+)
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from benchmarks.utils import timed
+from core.hashers import TunedArgon2PasswordHasher
+
+PASSWORD = 'correct horse battery staple'
+
+HASHERS = (
+    ('pbkdf2 (django default)', PBKDF2PasswordHasher),
+    ('argon2 (django default)', Argon2PasswordHasher),
+    ('argon2 (tuned)', TunedArgon2PasswordHasher),
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--hashes', type=int, default=20,
+                        help='Password checks timed for each hasher')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Clients logging in at once')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Seconds of logins in each mode')
+
+
+def client(users, deadline, latencies, errors):
+    """Log users in through the token endpoint until the deadline"""
+    http = Client()
+    url = reverse('user:token')
+    try:
+        while time.perf_counter() < deadline:
+            for user in users:
+                start = time.perf_counter()
+                response = http.post(url, {
+                    'email': user.email, 'password': PASSWORD
+                })
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors.append(response.status_code)
+    finally:
+        connections.close_all()
+
+
+def login_load(users, concurrency, duration):
+    """Return the latencies and errors of concurrent logins"""
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client, args=(
+            users[i::concurrency], deadline, latencies, errors
+        ))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run(command, options):
+    cores = os.cpu_count() or 1
+    command.stdout.write(f'{cores} cores')
+
+    for name, hasher in HASHERS:
+        encoded = hasher().encode(PASSWORD, hasher().salt())
+        ms = timed(
+            lambda: check_password(PASSWORD, encoded), options['hashes']
+        )
+        command.stdout.write(
+            f'{name}: {ms:.1f} ms per check, '
+            f'{1000 / ms:.0f} logins/s per core'
+        )
+
+    # Login only needs a valid password, every user shares one hash
+    encoded = make_password(PASSWORD)
+    users = get_user_model().objects.bulk_create([
+        get_user_model()(email=f'login{i}@example.com', password=encoded)
+        for i in range(options['concurrency'] * 4)
+    ])
+
+    for mode, workers in (('request thread', 0), ('hashing pool', cores)):
+        with override_settings(PASSWORD_HASHING_WORKERS=workers):
+            latencies, errors = login_load(
+                users, options['concurrency'], options['duration']
+            )
+        if len(latencies) < 2:
+            command.stdout.write(f'{mode}: {len(errors)} errors')
+            continue
+        rate = len(latencies) / options['duration']
+        p50 = statistics.median(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        command.stdout.write(
+            f'{mode}: {rate:.0f} logins/s, {rate / cores:.0f} per core, '
+            f'p50 {p50:.1f} ms, p99 {p99:.1f} ms, {len(errors)} errors'
+        )
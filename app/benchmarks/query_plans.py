@@ -0,0 +1,80 @@
+"""Check the main endpoints are served with index scans on a large dataset"""
+import re
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import seed_dataset, explain
+from core.models import Tag, Ingredient, Recipe
+
+LARGE_TABLES = {
+    'core_recipe',
+    'core_tag',
+    'core_ingredient',
+    'core_recipe_tags',
+    'core_recipe_ingredients',
+}
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--recipes', type=int, default=30,
+                        help='Recipes per user')
+
+
+def endpoints(user):
+    """Return the (label, url, params) of the requests to check"""
+    tag = Tag.objects.filter(user=user).first()
+    ingredient = Ingredient.objects.filter(user=user).first()
+    recipe = Recipe.objects.filter(user=user).first()
+    return [
+        ('tag list', reverse('recipe:tag-list'), {}),
+        ('tag list assigned', reverse('recipe:tag-list'),
+         {'assigned_only': 1}),
+        ('ingredient list', reverse('recipe:ingredient-list'), {}),
+        ('ingredient list assigned', reverse('recipe:ingredient-list'),
+         {'assigned_only': 1}),
+        ('recipe list', reverse('recipe:recipe-list'), {}),
+        ('recipe list by tag', reverse('recipe:recipe-list'),
+         {'tags': tag.id}),
+        ('recipe list by ingredient', reverse('recipe:recipe-list'),
+         {'ingredients': ingredient.id}),
+        ('recipe detail', reverse('recipe:recipe-detail', args=[recipe.id]),
+         {}),
+    ]
+
+
+def run(command, options):
+    command.stdout.write('Seeding dataset...')
+    user = seed_dataset(users=options['users'], recipes=options['recipes'])[0]
+    client = APIClient()
+    client.force_authenticate(user)
+
+    failures = []
+    for label, url, params in endpoints(user):
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(url, params)
+
+        seq_scans = set()
+        for query in ctx.captured_queries:
+            plan = explain(query['sql'])
+            seq_scans.update(set(SEQ_SCAN.findall(plan)) & LARGE_TABLES)
+            if options['verbosity'] > 1:
+                command.stdout.write(f'{query["sql"]}\n{plan}\n')
+
+        if seq_scans:
+            failures.append(label)
+            command.stdout.write(command.style.ERROR(
+                f'{label}: sequential scan on {", ".join(sorted(seq_scans))}'
+            ))
+        else:
+            command.stdout.write(
+                command.style.SUCCESS(f'{label}: index scans only')
+            )
+
+    if failures:
+        raise CommandError(f'Sequential scans in: {", ".join(failures)}')
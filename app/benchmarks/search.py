@@ -0,0 +1,29 @@
+"""Time ranked full text searches on the recipe list endpoint"""
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import seed_dataset, analyze, timed
+from core.models import Recipe
+from core.search import update_search_vectors
+
+TERMS = ('curry', 'chicken lime', 'garlic -butter', '"lemon rice"')
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000,
+                        help='Recipes per user')
+
+
+def run(command, options):
+    command.stdout.write('Seeding dataset...')
+    user = seed_dataset(users=options['users'], recipes=options['recipes'])[0]
+    update_search_vectors(Recipe.objects.all())
+    analyze()
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('recipe:recipe-list')
+    for term in TERMS:
+        duration = timed(lambda: client.get(url, {'search': term}))
+        command.stdout.write(f'{term!r}: {duration:.2f} ms')
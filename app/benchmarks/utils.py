@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core.counts import recount
+from core.models import Tag, Ingredient, Recipe
+
+BATCH_SIZE = 5000
+WORDS = (
+    'apple', 'basil', 'butter', 'chicken', 'chili', 'curry', 'garlic',
+    'ginger', 'lemon', 'lime', 'mushroom', 'noodle', 'onion', 'pepper',
+    'potato', 'rice', 'salmon', 'tomato', 'tofu', 'vanilla',
+)
+
+
+def seed_dataset(users=10, recipes=100, tags=20, ingredients=50,
+                 tags_per_recipe=3, ingredients_per_recipe=5, seed=0,
+                 email_prefix='bench'):
+    """Bulk insert a dataset of the given size per user and return the users"""
+    rng = random.Random(seed)
+    user_objs = get_user_model().objects.bulk_create([
+        get_user_model()(email=f'{email_prefix}{i}@example.com', password='!')
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+
+    tag_objs = Tag.objects.bulk_create([
+        Tag(user=user, name=f'Tag {i}')
+        for user in user_objs for i in range(tags)
+    ], batch_size=BATCH_SIZE)
+    ingredient_objs = Ingredient.objects.bulk_create([
+        Ingredient(user=user, name=f'{WORDS[i % len(WORDS)]} {i}')
+        for user in user_objs for i in range(ingredients)
+    ], batch_size=BATCH_SIZE)
+    recipe_objs = Recipe.objects.bulk_create([
+        Recipe(user=user,
+               title=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+               time_minutes=rng.randint(5, 120),
+               price=rng.randint(100, 5000) / 100)
+        for user in user_objs for i in range(recipes)
+    ], batch_size=BATCH_SIZE)
+
+    tags_by_user = _group_by_user(tag_objs)
+    ingredients_by_user = _group_by_user(ingredient_objs)
+    tag_links = []
+    ingredient_links = []
+    for recipe in recipe_objs:
+        for tag in rng.sample(tags_by_user[recipe.user_id], tags_per_recipe):
+            tag_links.append(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            )
+        ingredients = ingredients_by_user[recipe.user_id]
+        for ingredient in rng.sample(ingredients, ingredients_per_recipe):
+            ingredient_links.append(Recipe.ingredients.through(
+                recipe_id=recipe.id, ingredient_id=ingredient.id
+            ))
+    Recipe.tags.through.objects.bulk_create(tag_links, batch_size=BATCH_SIZE)
+    Recipe.ingredients.through.objects.bulk_create(
+        ingredient_links, batch_size=BATCH_SIZE
+    )
+    # Bulk inserted links send no signals
+    recount(Tag)
+    recount(Ingredient)
+
+    analyze()
+    return user_objs
+
+
+def _group_by_user(objs):
+    grouped = {}
+    for obj in objs:
+        grouped.setdefault(obj.user_id, []).append(obj)
+    return grouped
+
+
+def analyze():
+    """Refresh the planner statistics after seeding"""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def explain(sql, params=None, analyze=False):
+    """Return the query plan of a SQL statement as text"""
+    prefix = 'EXPLAIN (ANALYZE) ' if analyze else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def timed(func, repeat=5):
+    """Call func repeat times and return the median duration in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
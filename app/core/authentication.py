@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    """Return the cache key holding the token with the given key"""
+    return f'auth:token:{key}'
+
+
+def user_token_cache_key(user_id):
+    """Return the cache key holding the token key cached for a user"""
+    return f'auth:user:{user_id}'
+
+
+def get_token_cache():
+    """Return the cache backend used for token lookups"""
+    return caches[settings.TOKEN_AUTH_CACHE_ALIAS]
+
+
+def get_token_cache_timeout():
+    """
+    Return the seconds a token stays cached
+
+    A local memory cache belongs to one process, the others would keep a
+    revoked token until it expires, so it only holds tokens for
+    TOKEN_AUTH_LOCAL_CACHE_TIMEOUT seconds.
+    """
+    if isinstance(get_token_cache(), LocMemCache):
+        return min(
+            settings.TOKEN_AUTH_CACHE_TIMEOUT,
+            settings.TOKEN_AUTH_LOCAL_CACHE_TIMEOUT
+        )
+    return settings.TOKEN_AUTH_CACHE_TIMEOUT
+
+
+def invalidate_user_token(user_id):
+    """Drop the cached token of a user, if there is one"""
+    cache = get_token_cache()
+    user_key = user_token_cache_key(user_id)
+    key = cache.get(user_key)
+    if key is not None:
+        cache.delete_many([token_cache_key(key), user_key])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication caching the token -> user resolution
+
+    Tokens are kept in the cache for TOKEN_AUTH_CACHE_TIMEOUT seconds and
+    dropped as soon as the token is deleted or its user is saved or deleted
+    (see core.signals). That takes a cache shared by every process, a local
+    memory cache only keeps them for a few seconds. Updates that bypass
+    model signals, like QuerySet.update(), are only picked up once the entry
+    expires.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(token_cache_key(key))
+
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set_many({
+                token_cache_key(key): token,
+                user_token_cache_key(user.pk): key,
+            }, get_token_cache_timeout())
+
+        return token.user, token
@@ -0,0 +1,78 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+def get_response_cache():
+    """Return the cache backend holding cached API responses"""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def response_cache_enabled():
+    """
+    Return whether API responses can be cached
+
+    A local memory cache is per process, versions bumped by a write in one
+    worker would leave the other workers serving stale responses, so it is
+    only used with RESPONSE_CACHE_LOCAL, for single process deployments.
+    """
+    return (
+        settings.RESPONSE_CACHE_LOCAL
+        or not isinstance(get_response_cache(), LocMemCache)
+    )
+
+
+def user_version_key(user_id):
+    """Return the cache key holding the response version of a user"""
+    return f'response:version:{user_id}'
+
+
+def response_cache_key(user_id, version, *parts):
+    """Return the cache key of a response, parts identify the request"""
+    digest = hashlib.sha1(
+        '\n'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'response:{user_id}:{version}:{digest}'
+
+
+def _new_version():
+    # Starting from the clock instead of 1 means a version evicted from the
+    # cache is never handed out again while responses cached under it remain
+    return time.time_ns()
+
+
+def get_user_version(user_id):
+    """Return the current response version of a user"""
+    cache = get_response_cache()
+    key = user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _incr_user_version(user_id):
+    cache = get_response_cache()
+    key = user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_version(), timeout=None)
+
+
+def bump_user_version(user_id):
+    """
+    Invalidate every cached response of a user
+
+    The version is bumped right away and again once the current transaction
+    commits, so responses built by concurrent requests from the data before
+    the commit are not served afterwards.
+    """
+    _incr_user_version(user_id)
+    transaction.on_commit(lambda: _incr_user_version(user_id))
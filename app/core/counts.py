@@ -0,0 +1,87 @@
+"""
+recipe_count of tags and ingredients
+
+The counts move by F() deltas in the transaction changing the links, so
+concurrent writes add up instead of overwriting each other. Each update
+locks its rows in pk order, in a subquery, so transactions adjusting the
+same objects wait for each other instead of deadlocking. recount()
+recomputes them from the links.
+"""
+from collections import Counter
+
+from django.db.models import (
+    Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+
+# Recipe field linking to each counted model
+RECIPE_FIELDS = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+}
+
+
+def update_recipe_counts(model, deltas):
+    """Add deltas, numbers of recipes by pk, to the recipe_count of objects"""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(set(deltas.values())) == 1:
+        change = Value(next(iter(deltas.values())))
+    else:
+        change = Case(
+            *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+            output_field=IntegerField()
+        )
+    locked = model.objects.select_for_update().filter(pk__in=deltas) \
+        .order_by('pk').values('pk')
+    # Lists sorted by usage change with the counts, so do their validators
+    model.objects.filter(pk__in=locked).update(
+        recipe_count=F('recipe_count') + change, updated_at=timezone.now()
+    )
+
+
+def linked_counts(field_name, recipe_ids):
+    """Return how many of the recipes each related object is linked to"""
+    field = Recipe._meta.get_field(field_name)
+    related = field.m2m_reverse_field_name()
+    links = field.remote_field.through.objects.filter(
+        **{f'{field.m2m_field_name()}__in': recipe_ids}
+    )
+    return Counter(dict(
+        links.order_by().values(related).annotate(count=Count('pk'))
+        .values_list(related, 'count')
+    ))
+
+
+def linked_pks(field_name, instance, reverse, pks=None):
+    """
+    Return the pks of the objects instance is linked to through field_name
+
+    instance is a recipe, or with reverse an object of the related model.
+    pks limits the result to some of the objects.
+    """
+    field = Recipe._meta.get_field(field_name)
+    own, other = field.m2m_field_name(), field.m2m_reverse_field_name()
+    if reverse:
+        own, other = other, own
+    links = field.remote_field.through.objects.filter(**{own: instance.pk})
+    if pks is not None:
+        links = links.filter(**{f'{other}__in': pks})
+    return list(links.values_list(other, flat=True))
+
+
+def recount(model):
+    """Recompute the recipe_count of every object, return how many changed"""
+    field = Recipe._meta.get_field(RECIPE_FIELDS[model])
+    related = field.m2m_reverse_field_name()
+    links = field.remote_field.through.objects.filter(
+        **{related: OuterRef('pk')}
+    ).order_by().values(related).annotate(count=Count('pk')).values('count')
+    count = Coalesce(Subquery(links), Value(0))
+    return model.objects.exclude(recipe_count=count).update(
+        recipe_count=count, updated_at=timezone.now()
+    )
@@ -0,0 +1,102 @@
+import threading
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+from core.db.backends.postgresql_pool.creation import DatabaseCreation
+from core.db.pool import ConnectionPool
+
+DEFAULT_POOL_OPTIONS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 300,
+    'MAX_AGE': 3600,
+    'CHECK_INTERVAL': 30,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(conn_params):
+    return tuple(sorted(
+        (key, str(value)) for key, value in conn_params.items()
+    ))
+
+
+def connect(conn_params, isolation_level=None):
+    """Open a connection set up like the stock backend does"""
+    connection = base.Database.connect(**conn_params)
+    if (isolation_level is not None and
+            isolation_level != connection.isolation_level):
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+def get_pool(settings_dict, conn_params):
+    """Return the process wide pool for the connection parameters"""
+    key = _pool_key(conn_params)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            options = {**DEFAULT_POOL_OPTIONS, **settings_dict.get('POOL', {})}
+            isolation_level = settings_dict['OPTIONS'].get('isolation_level')
+            pool = _pools[key] = ConnectionPool(
+                lambda: connect(conn_params, isolation_level),
+                database=conn_params.get('database', ''),
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                max_age=options['MAX_AGE'],
+                check_interval=options['CHECK_INTERVAL'],
+            )
+        return pool
+
+
+def close_pools(database=None):
+    """Close the pools of a database, or of every database"""
+    with _pools_lock:
+        pools = [
+            pool for pool in _pools.values()
+            if database is None or pool.database == database
+        ]
+    for pool in pools:
+        pool.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend borrowing its connections from a ConnectionPool
+
+    close() hands the connection back instead of closing it, so with
+    CONN_MAX_AGE = 0 a thread holds a connection for one request only and
+    the pool bounds the connections of the whole process. Pools are thread
+    safe. Async code can not use the ORM directly, the sync views ASGI runs
+    in threads check connections out like WSGI ones.
+    """
+    creation_class = DatabaseCreation
+    # See core.db.pool.release_connection()
+    pooled = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self._pool = get_pool(self.settings_dict, conn_params)
+        connection = self._pool.checkout()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self._pool is not None:
+            # A connection that raised and was not found usable again by
+            # close_if_unusable_or_obsolete() is not handed out anymore
+            self._pool.release(self.connection, discard=self.errors_occurred)
@@ -0,0 +1,11 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Test database creation closing the pooled connections it drops"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        from core.db.backends.postgresql_pool.base import close_pools
+
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
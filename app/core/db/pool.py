@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total',
+    'Connections handed out by the pool, by database',
+    ('database',),
+)
+POOL_CONNECTS = Counter(
+    'db_pool_connects_total',
+    'Connections opened by the pool, by database',
+    ('database',),
+)
+POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Open pooled connections, by database and state',
+    ('database', 'state'),
+)
+POOL_WAIT = Histogram(
+    'db_pool_wait_seconds',
+    'Time spent waiting for a pooled connection, by database',
+    ('database',),
+)
+POOL_CONNECTION_AGE = Histogram(
+    'db_pool_connection_age_seconds',
+    'Age of the connections handed out by the pool, by database',
+    ('database',),
+    buckets=(1, 10, 60, 300, 900, 1800, 3600),
+)
+
+
+class PoolExhausted(OperationalError):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of at most max_size connections to one database
+
+    Idle connections are reused most recent first. Connections older than
+    max_age or idle for more than max_idle are closed instead of reused, and
+    one idle for more than check_interval is pinged before being handed out.
+    """
+
+    def __init__(self, connect, database, max_size=10, timeout=10,
+                 max_idle=300, max_age=3600, check_interval=30):
+        self._connect = connect
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.check_interval = check_interval
+
+        self._cond = threading.Condition()
+        # Idle connections as (connection, created, released) tuples
+        self._idle = []
+        # Creation time of every open connection, by connection id
+        self._created = {}
+        self._size = 0
+        self.closed = False
+
+    def _set_gauges(self):
+        idle = len(self._idle)
+        POOL_CONNECTIONS.set(idle, database=self.database, state='idle')
+        POOL_CONNECTIONS.set(
+            self._size - idle, database=self.database, state='in_use'
+        )
+
+    def _forget(self, conn):
+        """Drop a connection from the pool, the caller holds the lock"""
+        self._created.pop(id(conn), None)
+        self._size -= 1
+        self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            logger.debug('Closing a pooled connection failed', exc_info=True)
+
+    @staticmethod
+    def _is_usable(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def checkout(self):
+        """Return a connection, waiting up to timeout for one to be free"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            conn, released, stale = self._take(deadline)
+            # Connecting and pinging happen outside the lock
+            for old in stale:
+                self._close(old)
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                        self._set_gauges()
+                    raise
+                POOL_CONNECTS.inc(database=self.database)
+                with self._cond:
+                    self._created[id(conn)] = time.monotonic()
+                break
+            if conn.closed or (
+                time.monotonic() - released > self.check_interval
+                and not self._is_usable(conn)
+            ):
+                with self._cond:
+                    self._forget(conn)
+                    self._set_gauges()
+                self._close(conn)
+                continue
+            break
+
+        now = time.monotonic()
+        with self._cond:
+            created = self._created.get(id(conn), now)
+        POOL_CHECKOUTS.inc(database=self.database)
+        POOL_WAIT.observe(now - start, database=self.database)
+        POOL_CONNECTION_AGE.observe(now - created, database=self.database)
+        return conn
+
+    def _take(self, deadline):
+        """
+        Reserve an idle connection, or a slot for a new one as None
+
+        Returns it with the time it was released and the idle connections
+        that expired on the way, which the caller closes.
+        """
+        stale = []
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise OperationalError('The connection pool is closed')
+                now = time.monotonic()
+                while self._idle:
+                    conn, created, released = self._idle.pop()
+                    if (now - created > self.max_age or
+                            now - released > self.max_idle):
+                        self._forget(conn)
+                        stale.append(conn)
+                        continue
+                    self._set_gauges()
+                    return conn, released, stale
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._set_gauges()
+                    return None, None, stale
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolExhausted(
+                        f'No connection to {self.database} became free '
+                        f'within {self.timeout} seconds'
+                    )
+                self._cond.wait(remaining)
+
+    def release(self, conn, discard=False):
+        """Give a connection back, rolling back what it left open"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            created = self._created.get(id(conn))
+            now = time.monotonic()
+            if created is None:
+                # Not one of ours, or already dropped from the pool
+                close = True
+            elif (discard or conn.closed or self.closed or
+                    now - created > self.max_age):
+                self._forget(conn)
+                close = True
+            else:
+                self._idle.append((conn, created, now))
+                self._cond.notify()
+                close = False
+            self._set_gauges()
+        if close:
+            self._close(conn)
+
+    def close(self):
+        """Close the idle connections, in use ones are closed on release"""
+        with self._cond:
+            self.closed = True
+            idle = [conn for conn, created, released in self._idle]
+            self._idle = []
+            for conn in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+            self._set_gauges()
+        for conn in idle:
+            self._close(conn)
+
+
+def release_connection(connection):
+    """
+    Hand a pooled connection back before a long wait on something else
+
+    Connections outside a pool or inside a transaction are kept. The next
+    query checks one out again.
+    """
+    if getattr(connection, 'pooled', False) and not connection.in_atomic_block:
+        connection.close()
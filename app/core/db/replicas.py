@@ -0,0 +1,203 @@
+"""
+Routing of safe API reads to read replicas
+
+Replicas are the aliases listed in settings.DATABASE_REPLICAS. Views using
+ReplicaReadMixin send the queries of GET, HEAD and OPTIONS requests to one
+of them once the user is authenticated, everything else goes to the
+primary. After a request of a user writes, from any view or signal
+receiver, their requests read from the primary for REPLICA_STICKY_SECONDS,
+so they see their own writes.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica has been behind the primary, 0 when it replayed
+# everything it received or is not a standby at all
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+# Alias the reads of the current request go to, None for the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+# Models written by the current request, see PrimaryPinMiddleware
+_writes = contextvars.ContextVar('writes', default=None)
+
+_round_robin = itertools.count()
+_lags = {}
+_lags_lock = threading.Lock()
+
+
+def get_replica_cache():
+    """Return the cache backend holding the users pinned to the primary"""
+    return caches[settings.REPLICA_CACHE_ALIAS]
+
+
+def pinned_user_key(user_id):
+    """Return the cache key set while a user reads from the primary"""
+    return f'db:primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send the reads of a user to the primary for the sticky window"""
+    get_replica_cache().set(
+        pinned_user_key(user_id), True, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    """Return whether a user wrote within the sticky window"""
+    return get_replica_cache().get(pinned_user_key(user_id), False)
+
+
+def measure_lag(alias):
+    """Return the lag of a replica in seconds, or None if it is down"""
+    # A separate wrapper, so checking a replica does not hold on to a
+    # connection of the thread
+    connection = connections.create_connection(alias)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_QUERY)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning('Could not measure the lag of replica %s', alias,
+                       exc_info=True)
+        return None
+    finally:
+        connection.close()
+
+
+def get_lag(alias):
+    """Return the lag of a replica, measured at most once per interval"""
+    now = time.monotonic()
+    with _lags_lock:
+        measured = _lags.get(alias)
+    if (measured is not None and
+            now - measured[0] < settings.REPLICA_LAG_CHECK_INTERVAL):
+        return measured[1]
+
+    lag = measure_lag(alias)
+    with _lags_lock:
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def reset_lags():
+    """Forget the measured lags, the next selection measures them again"""
+    with _lags_lock:
+        _lags.clear()
+
+
+def select_replica():
+    """
+    Return the replica to read from, or None to read from the primary
+
+    round_robin cycles through the replicas. least_lag picks the one most
+    up to date, skipping those that are down or more than REPLICA_MAX_LAG
+    seconds behind, and falls back to the primary if none is left.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    if settings.REPLICA_SELECTION == 'least_lag':
+        lags = [(get_lag(alias), alias) for alias in replicas]
+        lags = [
+            (lag, alias) for lag, alias in lags
+            if lag is not None and lag <= settings.REPLICA_MAX_LAG
+        ]
+        return min(lags)[1] if lags else None
+    return replicas[next(_round_robin) % len(replicas)]
+
+
+def get_read_alias():
+    """Return the alias the current request reads from, None for the primary"""
+    return _read_alias.get()
+
+
+class ReplicaRouter:
+    """
+    Database router sending reads where ReplicaReadMixin chose
+
+    Outside a safe request reads and writes all go to the primary, which is
+    also the only database migrated. Writes are noted for
+    PrimaryPinMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        return get_read_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.add(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Read from a replica in safe requests of users who did not just write
+
+    Authentication runs against the primary, so a token created a moment
+    ago is found.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and
+                not is_pinned(request.user.pk)):
+            _read_alias.set(select_replica())
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin the user of a request that wrote anything to the primary
+
+    The router notes the writes, so those of views without ReplicaReadMixin,
+    serializers and signal receivers pin the user as well.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = set()
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        # Set by DRF once it authenticated the request
+        user = getattr(request, 'user', None)
+        if writes and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
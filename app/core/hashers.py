@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher
+)
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+_local = threading.local()
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many passwords are being checked, try again.')
+    default_code = 'hashing_busy'
+
+
+def _mark_worker():
+    _local.worker = True
+
+
+def get_executor():
+    """Return the process wide hashing pool and its slots"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='password-hash',
+                initializer=_mark_worker,
+            )
+            _slots = threading.BoundedSemaphore(
+                workers + settings.PASSWORD_HASHING_QUEUE
+            )
+    return _executor, _slots
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run a hashing function in the bounded pool and return its future
+
+    At most PASSWORD_HASHING_WORKERS hashes run at once, so a burst of
+    signups or logins can not use more CPU and memory than that. Callers
+    wait up to PASSWORD_HASHING_TIMEOUT seconds for one of the
+    PASSWORD_HASHING_QUEUE places in line, then get a HashingBusy. Async
+    code can await the future with asyncio.wrap_future().
+    """
+    executor, slots = get_executor()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise HashingBusy()
+    try:
+        future = executor.submit(func, *args, **kwargs)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda future: slots.release())
+    return future
+
+
+def run(func, *args, **kwargs):
+    """
+    Return the result of a hashing function run in the bounded pool
+
+    The calling request thread still waits for the whole hash: the pool
+    only caps how many hashes compute at once, it does not take the work
+    off the request path.
+    """
+    # Hashers calling each other, like PBKDF2 verify() calling encode(),
+    # already run in a worker and must not wait for another one
+    if (settings.PASSWORD_HASHING_WORKERS == 0 or
+            getattr(_local, 'worker', False)):
+        return func(*args, **kwargs)
+    return submit(func, *args, **kwargs).result()
+
+
+class OffloadedHasherMixin:
+    """Cap the hashes of a hasher computing at once with the hashing pool"""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return run(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run(super().verify, password, encoded)
+
+
+class TunedArgon2PasswordHasher(OffloadedHasherMixin, Argon2PasswordHasher):
+    """
+    Argon2 with the costs from the ARGON2_* settings
+
+    The algorithm name is unchanged, so hashes made with other costs still
+    verify and are upgraded on the next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class OffloadedPBKDF2PasswordHasher(OffloadedHasherMixin,
+                                    PBKDF2PasswordHasher):
+    """PBKDF2 verifying the hashes made before the switch to Argon2"""
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.cache import bump_user_version
+from core.models import ImageStatus, Recipe
+from core.storage import published_name
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the accepted image formats
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+# name: (bounding box or None to keep the size, output format or None to keep
+# the uploaded one). WebP is skipped when Pillow is built without libwebp.
+VARIANTS = {
+    'original': (None, None),
+    'large': ((1280, 1280), 'JPEG'),
+    'thumbnail': ((320, 320), 'JPEG'),
+    'webp': ((1280, 1280), 'WEBP'),
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def sniff_image_format(header):
+    """Return the image format of a file from its first bytes, or None"""
+    for signature, image_format in SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def get_executor():
+    """Return the process wide worker pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+    return _executor
+
+
+def schedule_image_processing(recipe_id):
+    """Process the image of a recipe once the current transaction commits"""
+    transaction.on_commit(lambda: _submit(recipe_id))
+
+
+def delete_image_files_on_commit(recipe):
+    """
+    Delete the image files of a recipe once the transaction replacing them
+    commits
+
+    The paths are read with the recipe locked, so an image a worker finished
+    in the meantime is deleted with its variants. Must be called in a
+    transaction, before the new image is set.
+    """
+    current = Recipe.objects.select_for_update() \
+        .only('image', 'image_variants').get(pk=recipe.pk)
+    paths = set(current.image_variants.values())
+    if current.image:
+        paths.add(current.image.name)
+    if not paths:
+        return
+
+    storage = current.image.storage
+
+    def delete():
+        for path in paths:
+            storage.delete(path)
+    transaction.on_commit(delete)
+
+
+def _submit(recipe_id):
+    if settings.IMAGE_PROCESSING_WORKERS == 0:
+        process_recipe_image(recipe_id)
+    else:
+        get_executor().submit(_process_in_worker, recipe_id)
+
+
+def _process_in_worker(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Processing the image of recipe %s failed', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def _encode(image, box, image_format):
+    """Return the image resized to fit box and encoded without metadata"""
+    image = image.copy()
+    if box is not None:
+        image.thumbnail(box)
+    if image_format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    # Only pixel data is written, EXIF and other metadata are left behind
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=85)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id):
+    """
+    Build the variants of a recipe image and mark it as ready
+
+    The pending upload is replaced by a copy stripped of its metadata, saved
+    under MEDIA_ROOT. If the recipe gets a new image in the meantime, the
+    result is thrown away.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    uploaded = recipe.image.name
+    current = Recipe.objects.filter(pk=recipe_id, image=uploaded)
+    current.update(
+        image_status=ImageStatus.PROCESSING, updated_at=timezone.now()
+    )
+    bump_user_version(recipe.user_id)
+
+    storage = recipe.image.storage
+    variants = {}
+    try:
+        with storage.open(uploaded, 'rb') as file:
+            image = Image.open(file)
+            image.load()
+        image_format = image.format if image.format in EXTENSIONS else 'JPEG'
+        image = ImageOps.exif_transpose(image)
+
+        base = os.path.splitext(published_name(uploaded))[0]
+        for name, (box, variant_format) in VARIANTS.items():
+            variant_format = variant_format or image_format
+            if variant_format == 'WEBP' and not features.check('webp'):
+                continue
+            path = f'{base}_{name}.{EXTENSIONS.get(variant_format, "img")}'
+            variants[name] = storage.save(
+                path, _encode(image, box, variant_format)
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.info('Recipe %s has an invalid image', recipe_id)
+        for path in variants.values():
+            storage.delete(path)
+        current.update(
+            image_status=ImageStatus.FAILED,
+            image_variants={},
+            updated_at=timezone.now(),
+        )
+        bump_user_version(recipe.user_id)
+        return
+
+    updated = current.update(
+        image=variants['original'],
+        image_status=ImageStatus.READY,
+        image_variants=variants,
+        updated_at=timezone.now(),
+    )
+    bump_user_version(recipe.user_id)
+    if updated:
+        storage.delete(uploaded)
+    else:
+        for path in variants.values():
+            storage.delete(path)
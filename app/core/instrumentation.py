@@ -0,0 +1,227 @@
+"""
+Per endpoint request metrics
+
+RequestMetricsMiddleware times each request and the SQL queries it runs on
+every database, and records them by view and action in the histograms
+below, exposed by core.views.MetricsView. Serializers using
+TimedSerializerMixin add the time spent in them. With METRICS_DIR, the
+middleware also saves the metrics of the process for the other workers.
+"""
+import collections
+import contextlib
+import contextvars
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import Counter, Histogram, write_snapshot
+
+REQUESTS = Counter(
+    'http_requests_total',
+    'Requests handled, by view, action and status code',
+    ('view', 'action', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling requests, by view and action',
+    ('view', 'action'),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries',
+    'SQL queries run per request, by view and action',
+    ('view', 'action'),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_QUERY_DURATION = Histogram(
+    'http_request_query_duration_seconds',
+    'Time spent in SQL queries per request, by view and action',
+    ('view', 'action'),
+)
+REQUEST_SERIALIZER_DURATION = Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time spent in serializers per request, by view and action',
+    ('view', 'action'),
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Size of the response bodies, by view and action',
+    ('view', 'action'),
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000),
+)
+
+# Statements shown in the X-Duplicate-Queries header, and their length
+DUPLICATES_SHOWN = 3
+DUPLICATE_SQL_LENGTH = 120
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+_snapshot_lock = threading.Lock()
+_snapshot_time = None
+
+
+def save_metrics(force=False):
+    """
+    Save the metrics of this process to METRICS_DIR
+
+    Unless forced, only when the last save is METRICS_FLUSH_INTERVAL
+    seconds old and no other thread is saving.
+    """
+    global _snapshot_time
+    if not settings.METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and _snapshot_time is not None and (
+        now - _snapshot_time < settings.METRICS_FLUSH_INTERVAL
+    ):
+        return
+    if not _snapshot_lock.acquire(blocking=force):
+        return
+    try:
+        _snapshot_time = now
+        write_snapshot(settings.METRICS_DIR)
+    finally:
+        _snapshot_lock.release()
+
+
+class RequestStats:
+    """What one request spent, filled in while it runs"""
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.action = None
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        # Executions of each SQL statement, before its parameters are bound
+        self.statements = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper counting and timing the queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """Return the statements run more than once, most repeated first"""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count > 1
+        ]
+
+
+def get_request_stats():
+    """Return the stats of the request being handled, or None"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the serializer time of a request"""
+    stats = get_request_stats()
+    if stats is None:
+        yield
+        return
+    # Nested serializers are part of the outermost one's time
+    stats.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        if not stats.serializer_depth:
+            stats.serializer_time += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """Count the time spent serializing and validating in request metrics"""
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+    def run_validation(self, *args, **kwargs):
+        with serializer_timer():
+            return super().run_validation(*args, **kwargs)
+
+
+def _format_sql(sql):
+    # Header values are ASCII on a single line
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = sql.encode('ascii', 'replace').decode()
+    if len(sql) > DUPLICATE_SQL_LENGTH:
+        sql = sql[:DUPLICATE_SQL_LENGTH - 3] + '...'
+    return sql
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, queries, serializer time and size of each request
+
+    With QUERY_DEBUG_HEADERS, responses also get X-Queries with the query
+    count and time, and X-Duplicate-Queries listing the statements run more
+    than once, the usual sign of a missing select_related or prefetch.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(stats)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - start
+
+        self.record(request, response, stats, duration)
+        save_metrics()
+        if settings.QUERY_DEBUG_HEADERS:
+            self.add_debug_headers(response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = get_request_stats()
+        if stats is not None:
+            stats.view = request.resolver_match.view_name
+            # Viewsets map each method to an action, like list or create
+            actions = getattr(view_func, 'actions', None) or {}
+            stats.action = actions.get(request.method.lower())
+
+    def record(self, request, response, stats, duration):
+        labels = {
+            'view': stats.view,
+            'action': stats.action or request.method.lower(),
+        }
+        REQUESTS.inc(status=response.status_code, **labels)
+        REQUEST_DURATION.observe(duration, **labels)
+        REQUEST_QUERIES.observe(stats.queries, **labels)
+        REQUEST_QUERY_DURATION.observe(stats.query_time, **labels)
+        REQUEST_SERIALIZER_DURATION.observe(stats.serializer_time, **labels)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), **labels)
+
+    def add_debug_headers(self, response, stats):
+        response['X-Queries'] = (
+            f'{stats.queries}; time={stats.query_time * 1000:.1f}ms'
+        )
+        duplicates = stats.duplicates()
+        if duplicates:
+            response['X-Duplicate-Queries'] = ' | '.join(
+                f'{count}x {_format_sql(sql)}'
+                for sql, count in duplicates[:DUPLICATES_SHOWN]
+            )
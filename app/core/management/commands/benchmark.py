@@ -0,0 +1,52 @@
+import pkgutil
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+import benchmarks
+
+
+def scenarios():
+    """Return the benchmark modules by name"""
+    modules = (
+        import_module(f'benchmarks.{info.name}')
+        for info in pkgutil.iter_modules(benchmarks.__path__)
+    )
+    return {
+        module.__name__.rsplit('.', 1)[-1]: module
+        for module in modules if hasattr(module, 'run')
+    }
+
+
+class Command(BaseCommand):
+    """ Django command to run a benchmark scenario on a throwaway database """
+    help = 'Run a scenario from the benchmarks package against a test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the test database between runs'
+        )
+        subparsers = parser.add_subparsers(dest='scenario', required=True)
+        for name, module in sorted(scenarios().items()):
+            subparser = subparsers.add_parser(name, help=module.__doc__)
+            if hasattr(module, 'add_arguments'):
+                module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        module = scenarios()[options['scenario']]
+        old_name = connection.settings_dict['NAME']
+
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            module.run(self, options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
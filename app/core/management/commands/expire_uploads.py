@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipe.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    """Delete chunked uploads abandoned for longer than the expiry"""
+    help = ('Delete chunked image uploads older than CHUNKED_UPLOAD_EXPIRY '
+            'and partial files left without an upload')
+
+    def handle(self, *args, **options):
+        uploads, files = delete_expired_uploads()
+        self.stdout.write(
+            f'{uploads} expired uploads and {files} stray files deleted'
+        )
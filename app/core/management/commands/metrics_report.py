@@ -0,0 +1,142 @@
+import json
+import os
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.instrumentation import (
+    REQUEST_DURATION, REQUEST_QUERIES, REQUEST_QUERY_DURATION,
+    REQUEST_SERIALIZER_DURATION, REQUESTS, RESPONSE_SIZE
+)
+
+SORT_KEYS = {
+    'time': lambda row: row['time'],
+    'queries': lambda row: row['queries'],
+    'requests': lambda row: row['requests'],
+}
+
+
+def quantile(buckets, q):
+    """Return the upper bound of the bucket holding the q quantile"""
+    buckets = sorted(
+        (float(bound), count) for bound, count in buckets.items()
+    )
+    total = buckets[-1][1]
+    for bound, count in buckets:
+        if total and count >= q * total:
+            return bound
+    return float('inf')
+
+
+def samples_by_endpoint(collected, metric):
+    """Return the histogram samples of a metric by (view, action)"""
+    samples = collected.get(metric.name, {}).get('samples', [])
+    return {
+        (sample['labels']['view'], sample['labels']['action']): sample['value']
+        for sample in samples
+    }
+
+
+def endpoint_rows(collected):
+    """Return one row of figures per view and action"""
+    durations = samples_by_endpoint(collected, REQUEST_DURATION)
+    queries = samples_by_endpoint(collected, REQUEST_QUERIES)
+    query_time = samples_by_endpoint(collected, REQUEST_QUERY_DURATION)
+    serializer_time = samples_by_endpoint(
+        collected, REQUEST_SERIALIZER_DURATION
+    )
+    sizes = samples_by_endpoint(collected, RESPONSE_SIZE)
+
+    errors = {}
+    for sample in collected.get(REQUESTS.name, {}).get('samples', []):
+        labels = sample['labels']
+        if int(labels['status']) >= 500:
+            key = (labels['view'], labels['action'])
+            errors[key] = errors.get(key, 0) + sample['value']
+
+    rows = []
+    for key, duration in durations.items():
+        count = duration['count']
+        if not count:
+            continue
+        rows.append({
+            'endpoint': ' '.join(key),
+            'requests': count,
+            'errors': errors.get(key, 0),
+            'time': duration['sum'],
+            'p50': quantile(duration['buckets'], .5),
+            'p95': quantile(duration['buckets'], .95),
+            'queries': queries[key]['sum'],
+            'queries_p95': quantile(queries[key]['buckets'], .95),
+            'query_time': query_time[key]['sum'] / count,
+            'serializer_time': serializer_time[key]['sum'] / count,
+            'size': sizes[key]['sum'] / sizes[key]['count']
+            if sizes.get(key, {}).get('count') else 0,
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    """ Django command printing the request metrics of a running server """
+    help = 'Report latency, queries, serializer time and response size per ' \
+           'endpoint, from the metrics endpoint of a server. Without ' \
+           'METRICS_DIR, the report only covers the process answering.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default=os.environ.get(
+                'METRICS_URL', 'http://127.0.0.1:8000/api/metrics/'
+            ),
+            help='Metrics endpoint to read'
+        )
+        parser.add_argument(
+            '--token', default=os.environ.get('METRICS_TOKEN'),
+            help='API token of a staff user'
+        )
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='time',
+            help='Order endpoints by total time, queries or requests'
+        )
+        parser.add_argument('--limit', type=int, default=20)
+
+    def fetch(self, url, token):
+        """Return the metrics collected by the server"""
+        request = urllib.request.Request(url, headers={
+            'Accept': 'application/json',
+            **({'Authorization': f'Token {token}'} if token else {}),
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return json.load(response)
+        except (urllib.error.URLError, ValueError) as exc:
+            raise CommandError(f'Could not read metrics from {url}: {exc}')
+
+    def handle(self, *args, **options):
+        collected = self.fetch(options['url'], options['token'])
+        rows = sorted(
+            endpoint_rows(collected), key=SORT_KEYS[options['sort']],
+            reverse=True
+        )[:options['limit']]
+        if not rows:
+            self.stdout.write('No requests recorded yet.')
+            return
+
+        width = max(len(row['endpoint']) for row in rows)
+        self.stdout.write(
+            f'{"endpoint":<{width}} {"reqs":>7} {"5xx":>5} {"total s":>9} '
+            f'{"p50 ms":>7} {"p95 ms":>7} {"queries":>8} {"q p95":>6} '
+            f'{"sql ms":>7} {"ser ms":>7} {"size kB":>8}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["endpoint"]:<{width}} {row["requests"]:>7} '
+                f'{row["errors"]:>5} {row["time"]:>9.2f} '
+                f'{row["p50"] * 1000:>7.0f} {row["p95"] * 1000:>7.0f} '
+                f'{row["queries"] / row["requests"]:>8.1f} '
+                f'{row["queries_p95"]:>6.0f} '
+                f'{row["query_time"] * 1000:>7.1f} '
+                f'{row["serializer_time"] * 1000:>7.1f} '
+                f'{row["size"] / 1000:>8.1f}'
+            )
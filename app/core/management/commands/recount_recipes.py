@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.counts import RECIPE_FIELDS, recount
+
+
+class Command(BaseCommand):
+    """Recompute the recipe_count of every tag and ingredient"""
+    help = ('Recompute the recipe_count of every tag and ingredient from '
+            'their recipe links')
+
+    def handle(self, *args, **options):
+        for model in RECIPE_FIELDS:
+            with transaction.atomic():
+                changed = recount(model)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {changed} recounted'
+            )
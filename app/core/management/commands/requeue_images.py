@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.images import process_recipe_image
+from core.models import ImageStatus, Recipe
+
+
+class Command(BaseCommand):
+    """Process the recipe images whose worker stopped before finishing"""
+    help = ('Process recipe images left pending or processing, like the '
+            'ones queued in a gunicorn worker that was recycled')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, default=600,
+            help='Only images unchanged for this many seconds, newer ones '
+                 'may still be in a worker queue'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=options['older_than']
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(
+                image_status__in=(ImageStatus.PENDING, ImageStatus.PROCESSING),
+                updated_at__lt=cutoff,
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        for recipe_id in recipe_ids:
+            process_recipe_image(recipe_id)
+        self.stdout.write(f'{len(recipe_ids)} images processed')
@@ -1,21 +1,101 @@
+import random
 import time
-from django.db import connections
-from django.db.utils import OperationalError
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
 
 
 class Command(BaseCommand):
     """ Django command to pause execution until database is available """
+    help = 'Wait until the database answers queries, and optionally until ' \
+           'it has no unapplied migrations'
 
-    def handle(self, *args, **options):
-        self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to probe'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds'
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Seconds to wait after the first failed probe'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Upper bound of the wait between two probes'
+        )
+        parser.add_argument(
+            '--wait-migrations', action='store_true',
+            help='Also wait until every migration is applied'
+        )
+
+    @staticmethod
+    def backoff(attempt, initial_delay, max_delay):
+        """
+        Return the wait after a number of failed probes
+
+        The bound doubles on each attempt up to max_delay. Half of it is
+        random, so replicas starting together do not probe in lockstep.
+        """
+        bound = min(max_delay, initial_delay * 2 ** attempt)
+        return bound / 2 + random.uniform(0, bound / 2)
+
+    def probe(self, alias):
+        """Return True once a new connection to the database ran a query"""
+        # A separate wrapper, so a failed probe leaves nothing behind in
+        # the connection the rest of the process uses
+        connection = connections.create_connection(alias)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()
+        return True
+
+    def pending_migrations(self, connection):
+        """Return the migrations not applied to the database yet"""
+        executor = MigrationExecutor(connection)
+        return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+    def wait(self, check, options, deadline, message):
+        """Call check until it returns True, backing off between calls"""
+        attempt = 0
+        while True:
             try:
-                db_conn = connections['default']
+                if check():
+                    return
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                pass
+            delay = self.backoff(
+                attempt, options['initial_delay'], options['max_delay']
+            )
+            if time.monotonic() + delay > deadline:
+                raise CommandError(
+                    f'{message} after {options["timeout"]:g} seconds'
+                )
+            self.stdout.write(f'{message}, waiting {delay:.2f} seconds...')
+            time.sleep(delay)
+            attempt += 1
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        deadline = time.monotonic() + options['timeout']
+
+        self.stdout.write('Waiting for database...')
+        self.wait(
+            lambda: self.probe(alias),
+            options, deadline, 'Database unavailable'
+        )
+
+        if options['wait_migrations']:
+            self.wait(
+                lambda: not self.pending_migrations(connections[alias]),
+                options, deadline, 'Migrations pending'
+            )
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
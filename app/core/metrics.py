@@ -0,0 +1,278 @@
+import glob
+import json
+import os
+import threading
+
+
+class Registry:
+    """Process wide collection of the metrics exposed by core.views"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+
+    def collect(self):
+        """Return the current value of every metric by name"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.collect() for metric in metrics}
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """
+    Base of the metrics, values are split by the values of their labels
+
+    Values are kept per process, workers share them through the snapshots
+    below.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} expects the labels {", ".join(self.labelnames)}'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _sample(self, value):
+        return value
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'samples': [
+                {
+                    'labels': dict(zip(self.labelnames, key)),
+                    'value': self._sample(value),
+                }
+                for key, value in values
+            ],
+        }
+
+
+class Counter(Metric):
+    """Monotonic counter"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the value for the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the value for the given labels"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        """Subtract amount from the value for the given labels"""
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        """Replace the value for the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values over cumulative buckets"""
+    type = 'histogram'
+
+    DEFAULT_BUCKETS = (
+        .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10
+    )
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY,
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        """Record one observed value for the given labels"""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * len(self.buckets), 0)
+            )
+            counts = [
+                count + (value <= bound)
+                for count, bound in zip(counts, self.buckets)
+            ]
+            self._values[key] = (counts, total + value)
+
+    def _sample(self, value):
+        counts, total = value
+        return {
+            'buckets': dict(zip(
+                ('+Inf' if bound == float('inf') else bound
+                 for bound in self.buckets),
+                counts
+            )),
+            'count': counts[-1],
+            'sum': total,
+        }
+
+
+def _merge_values(kind, value, other):
+    if kind != 'histogram':
+        return value + other
+    buckets = dict(value['buckets'])
+    for bound, count in other['buckets'].items():
+        buckets[bound] = buckets.get(bound, 0) + count
+    return {
+        'buckets': buckets,
+        'count': value['count'] + other['count'],
+        'sum': value['sum'] + other['sum'],
+    }
+
+
+def merge(*collected):
+    """Return the sum of several Registry.collect() results"""
+    merged = {}
+    for metrics in collected:
+        for name, metric in metrics.items():
+            target = merged.setdefault(name, {
+                'type': metric['type'], 'help': metric['help'], 'values': {}
+            })
+            for sample in metric['samples']:
+                key = tuple(sample['labels'].items())
+                value = sample['value']
+                if key in target['values']:
+                    value = _merge_values(
+                        metric['type'], target['values'][key], value
+                    )
+                target['values'][key] = value
+    return {
+        name: {
+            'type': metric['type'],
+            'help': metric['help'],
+            'samples': [
+                {'labels': dict(key), 'value': value}
+                for key, value in sorted(metric['values'].items())
+            ],
+        }
+        for name, metric in merged.items()
+    }
+
+
+# Snapshot of the processes that exited, see archive_snapshot()
+ARCHIVE_NAME = 'archive.json'
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path, collected):
+    # Replaced in one step, readers never see a partial file
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(collected, file)
+    os.replace(temporary, path)
+
+
+def write_snapshot(directory, registry=REGISTRY):
+    """Save the metrics of this process in directory"""
+    _write(_snapshot_path(directory, os.getpid()), registry.collect())
+
+
+def read_snapshots(directory):
+    """Return the sum of the metrics saved in directory by every process"""
+    return merge(*(
+        _read(path)
+        for path in sorted(glob.glob(os.path.join(directory, '*.json')))
+    ))
+
+
+def archive_snapshot(directory, pid):
+    """
+    Fold the snapshot of an exited process into the archive
+
+    Counters and histograms keep counting from the archive, gauges describe
+    the process and are dropped with it.
+    """
+    path = _snapshot_path(directory, pid)
+    if not os.path.exists(path):
+        return
+    snapshot = {
+        name: metric for name, metric in _read(path).items()
+        if metric['type'] != 'gauge'
+    }
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    _write(archive, merge(_read(archive), snapshot))
+    os.remove(path)
+
+
+def clear_snapshots(directory):
+    """Remove the snapshots left in directory, creating it if needed"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def to_text(collected):
+    """Return metrics from Registry.collect() in the Prometheus text format"""
+    lines = []
+    for name, metric in collected.items():
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        for sample in metric['samples']:
+            labels = sample['labels']
+            value = sample['value']
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            for bound, count in value['buckets'].items():
+                bucket_labels = _format_labels({**labels, 'le': bound})
+                lines.append(f'{name}_bucket{bucket_labels} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value["sum"]}')
+            lines.append(
+                f'{name}_count{_format_labels(labels)} {value["count"]}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    from core.search import search_vector_expression
+
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.update(search_vector=search_vector_expression(
+        apps.get_model('core', 'Tag'),
+        apps.get_model('core', 'Ingredient'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search__c01407_gin'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_change_log(apps, schema_editor):
+    """Log the objects created before the change log existed"""
+    ChangeLog = apps.get_model('core', 'ChangeLog')
+    SyncState = apps.get_model('core', 'SyncState')
+
+    seqs = {}
+    entries = []
+    for model_name in ('tag', 'ingredient', 'recipe'):
+        model = apps.get_model('core', model_name)
+        objects = model.objects.order_by('pk').values_list('user_id', 'pk')
+        for user_id, pk in objects.iterator():
+            seqs[user_id] = seqs.get(user_id, 0) + 1
+            entries.append(ChangeLog(
+                user_id=user_id, seq=seqs[user_id],
+                model=model_name, object_id=pk
+            ))
+
+    ChangeLog.objects.bulk_create(entries, batch_size=1000)
+    SyncState.objects.bulk_create([
+        SyncState(user_id=user_id, seq=seq) for user_id, seq in seqs.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('model', models.CharField(max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['user', 'seq'], name='core_change_user_id_9e6e3f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='changelog',
+            constraint=models.UniqueConstraint(fields=('user', 'model', 'object_id'), name='core_changelog_user_object_unique'),
+        ),
+        migrations.RunPython(populate_change_log, migrations.RunPython.noop),
+    ]
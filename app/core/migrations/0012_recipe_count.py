@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_recipe_counts(apps, schema_editor):
+    """Count the recipes linked to each existing tag and ingredient"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, model_name in (('tags', 'tag'), ('ingredients', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        links = Recipe._meta.get_field(field_name).remote_field.through.objects \
+            .filter(**{model_name: OuterRef('pk')}).order_by() \
+            .values(model_name).annotate(count=Count('pk')).values('count')
+        model.objects.update(recipe_count=Coalesce(Subquery(links), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_recipe_counts, migrations.RunPython.noop),
+    ]
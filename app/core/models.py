@@ -1,9 +1,15 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.auth.models import (
+    AbstractBaseUser, BaseUserManager, PermissionsMixin
+)
 from django.conf import settings
 import uuid
 import os
 
+from core.storage import PENDING_PREFIX, RecipeImageStorage
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -11,8 +17,9 @@ class UserManager(BaseUserManager):
         if not email:
             raise ValueError('User must have a valid email address')
 
+        # self.model is like a default construct for User class
         user = self.model(email=self.normalize_email(email),
-                          **extra_fields)  # self.model is like a default construct for User class
+                          **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
 
@@ -47,6 +54,14 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Recipes linked to it, kept up to date by core.counts
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name']),
+        ]
 
     def __str__(self):
         return self.name
@@ -59,6 +74,14 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Recipes linked to it, kept up to date by core.counts
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name']),
+        ]
 
     def __str__(self):
         return self.name
@@ -71,6 +94,20 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+def pending_recipe_image_file_path(instance, filename):
+    """Generate file path for new recipe image waiting to be processed"""
+    return PENDING_PREFIX + recipe_image_file_path(instance, filename)
+
+
+class ImageStatus(models.TextChoices):
+    """Processing state of a recipe image"""
+    NONE = 'none'
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
 class Recipe(models.Model):
     """Recipe model"""
     user = models.ForeignKey(
@@ -83,7 +120,92 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True, upload_to=pending_recipe_image_file_path,
+        storage=RecipeImageStorage()
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+    )
+    # Storage paths of the processed image by variant name, see core.images
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Title, tag and ingredient names, maintained by core.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Also bumped when the tags or ingredients change, see core.signals
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ImageUpload(models.Model):
+    """Recipe image being uploaded in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Path of the partially uploaded file on local disk"""
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
+
+    def __str__(self):
+        return f'{self.pk} ({self.offset}/{self.size})'
+
+
+class SyncState(models.Model):
+    """Last sequence number handed out in the change log of a user"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    seq = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.seq}'
+
+
+class ChangeLog(models.Model):
+    """
+    Latest change of a recipe, tag or ingredient of a user, see core.sync
+
+    Each object has a single entry, moved to the next sequence number of its
+    user whenever it changes and kept as a tombstone once it is deleted.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    seq = models.PositiveBigIntegerField()
+    model = models.CharField(max_length=16)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'model', 'object_id'],
+                name='core_changelog_user_object_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'seq']),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} @ {self.seq}'
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+
+
+def _related_names(model):
+    """Subquery joining the names of the model's objects linked to a recipe"""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def search_vector_expression(tag_model=Tag, ingredient_model=Ingredient):
+    """Return the expression computing a recipe's search vector"""
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector(_related_names(tag_model), weight='B', config=config) +
+        SearchVector(
+            _related_names(ingredient_model), weight='B', config=config
+        )
+    )
+
+
+def update_search_vectors(recipes, touch=False):
+    """
+    Recompute the search vector of the recipes in a queryset
+
+    With touch, updated_at is bumped in the same query, for changes to the
+    tags or ingredients that the recipe's own save does not cover.
+    """
+    fields = {'updated_at': timezone.now()} if touch else {}
+    return recipes.update(search_vector=search_vector_expression(), **fields)
+
+
+def recipes_linked_to(model, pks):
+    """Return the recipes linked to the tags or ingredients with given pks"""
+    field = Recipe._meta.get_field('tags' if model is Tag else 'ingredients')
+    links = field.remote_field.through.objects.filter(
+        **{f'{field.m2m_reverse_field_name()}__in': pks}
+    )
+    return Recipe.objects.filter(pk__in=links.values(field.m2m_field_name()))
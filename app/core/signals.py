@@ -0,0 +1,198 @@
+import os
+
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_user_token
+from core.cache import bump_user_version
+from core.counts import RECIPE_FIELDS, linked_pks, update_recipe_counts
+from core.models import ImageUpload, Tag, Ingredient, Recipe
+from core.search import update_search_vectors, recipes_linked_to
+from core.sync import forget_user, record_changes
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_token_on_user_change(sender, instance, **kwargs):
+    """Make the next request of a changed user hit the database again"""
+    invalidate_user_token(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_user_token_on_token_change(sender, instance, **kwargs):
+    """Forget a token once it is deleted or replaced"""
+    invalidate_user_token(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_response_version(sender, instance, **kwargs):
+    """Invalidate the cached responses of the owner of a changed object"""
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_linked_response_version(sender, instance, action, **kwargs):
+    """Invalidate the cached responses of a user whose recipe links changed"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_saved_change(sender, instance, **kwargs):
+    """Log a saved object for delta sync"""
+    record_changes(instance.user_id, sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_deleted_change(sender, instance, **kwargs):
+    """Leave a tombstone of a deleted object for delta sync"""
+    record_changes(instance.user_id, sender, [instance.pk], deleted=True)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_deleted_user(sender, instance, **kwargs):
+    """Drop the change log of a deleted user, tombstones included"""
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, created, update_fields,
+                                **kwargs):
+    """Index the title of a saved recipe"""
+    if created or update_fields is None or 'title' in update_fields:
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search_vectors(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Index the tag and ingredient names of recipes whose links changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors(
+                Recipe.objects.filter(pk=instance.pk), touch=True
+            )
+    elif action == 'pre_clear':
+        linked = recipes_linked_to(type(instance), [instance.pk])
+        instance._cleared_recipe_ids = list(
+            linked.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=instance._cleared_recipe_ids),
+            touch=True
+        )
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=pk_set), touch=True
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """Index the new name of a tag or ingredient in its recipes"""
+    if not created:
+        update_search_vectors(
+            recipes_linked_to(sender, [instance.pk]), touch=True
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def record_linked_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Log the recipes whose tags or ingredients changed for delta sync"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_changes(instance.user_id, Recipe, [instance.pk])
+    elif action == 'post_clear':
+        record_changes(instance.user_id, Recipe, instance._cleared_recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        record_changes(instance.user_id, Recipe, pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_search_vectors(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient before its links go"""
+    linked = recipes_linked_to(sender, [instance.pk])
+    instance._linked_recipe_ids = list(linked.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_search_vectors(sender, instance, **kwargs):
+    """Drop the name of a deleted tag or ingredient from its recipes"""
+    update_search_vectors(
+        Recipe.objects.filter(pk__in=instance._linked_recipe_ids), touch=True
+    )
+    record_changes(instance.user_id, Recipe, instance._linked_recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_recipe_counts(sender, instance, action, reverse, model,
+                                pk_set, **kwargs):
+    """Count the links gained or lost by tags and ingredients"""
+    counted = type(instance) if reverse else model
+    field_name = RECIPE_FIELDS[counted]
+    if action in ('pre_remove', 'pre_clear'):
+        instance._unlinked_pks = linked_pks(
+            field_name, instance, reverse,
+            pk_set if action == 'pre_remove' else None
+        )
+        return
+    if action == 'post_add':
+        delta, pks = 1, pk_set
+    elif action in ('post_remove', 'post_clear'):
+        delta, pks = -1, instance._unlinked_pks
+    else:
+        return
+
+    # Counted after the change log is written, every transaction locks the
+    # user's sync state before the counted rows and none can deadlock
+    if reverse:
+        update_recipe_counts(counted, {instance.pk: delta * len(pks)})
+    else:
+        update_recipe_counts(counted, {pk: delta for pk in pks})
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_deleted_recipe_links(sender, instance, **kwargs):
+    """Remember the tags and ingredients of a recipe before its links go"""
+    instance._linked_pks = {
+        model: linked_pks(field_name, instance, False)
+        for model, field_name in RECIPE_FIELDS.items()
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    """Take a deleted recipe off the counts of its tags and ingredients"""
+    for model, pks in instance._linked_pks.items():
+        update_recipe_counts(model, {pk: -1 for pk in pks})
+
+
+@receiver(post_delete, sender=ImageUpload)
+def delete_partial_upload(sender, instance, **kwargs):
+    """Remove the file of a committed or abandoned chunked upload"""
+    try:
+        os.remove(instance.path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,63 @@
+"""
+Storage of recipe images
+
+Uploads wait for processing under PENDING_PREFIX, names this storage keeps
+in settings.PENDING_IMAGE_DIR. That directory is not served, so neither is
+the EXIF data of raw uploads. The stripped copies made by core.images live
+under MEDIA_ROOT like any other media.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+PENDING_PREFIX = 'pending/'
+
+
+def is_pending(name):
+    """Return whether a file name is that of an image waiting processing"""
+    return name.startswith(PENDING_PREFIX)
+
+
+def published_name(name):
+    """Return the name under MEDIA_ROOT of a pending or processed image"""
+    return name[len(PENDING_PREFIX):] if is_pending(name) else name
+
+
+class RecipeImageStorage(FileSystemStorage):
+    """Media storage keeping pending images in PENDING_IMAGE_DIR"""
+
+    def _route(self, name):
+        """Return the storage holding a name and the name within it"""
+        if is_pending(name):
+            pending = FileSystemStorage(location=settings.PENDING_IMAGE_DIR)
+            return pending, published_name(name)
+        return super(), name
+
+    def _open(self, name, mode='rb'):
+        storage, name = self._route(name)
+        return storage._open(name, mode)
+
+    def _save(self, name, content):
+        storage, stored = self._route(name)
+        saved = storage._save(stored, content)
+        return PENDING_PREFIX + saved if is_pending(name) else saved
+
+    def delete(self, name):
+        storage, name = self._route(name)
+        storage.delete(name)
+
+    def exists(self, name):
+        storage, name = self._route(name)
+        return storage.exists(name)
+
+    def path(self, name):
+        storage, name = self._route(name)
+        return storage.path(name)
+
+    def size(self, name):
+        storage, name = self._route(name)
+        return storage.size(name)
+
+    def url(self, name):
+        if is_pending(name):
+            raise ValueError(f'{name} is not served until processed')
+        return super().url(name)
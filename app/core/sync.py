@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import F
+
+from core.models import ChangeLog, SyncState
+
+
+def _allocate(user_id, count):
+    """
+    Reserve count sequence numbers of a user and return the last one
+
+    The UPDATE locks the user's sync state until the transaction ends, so
+    sequence numbers become visible to readers in the order they were given
+    out and a client cursor never skips a write committed after it.
+    """
+    states = SyncState.objects.filter(pk=user_id)
+    if not states.update(seq=F('seq') + count):
+        SyncState.objects.get_or_create(user_id=user_id)
+        states.update(seq=F('seq') + count)
+    return states.values_list('seq', flat=True).get()
+
+
+def record_changes(user_id, model, pks, deleted=False):
+    """Log that the objects of a user with the given pks changed"""
+    pks = list(dict.fromkeys(pks))
+    if not pks:
+        return
+
+    label = model._meta.model_name
+    with transaction.atomic():
+        last = _allocate(user_id, len(pks))
+        ChangeLog.objects.filter(
+            user_id=user_id, model=label, object_id__in=pks
+        ).delete()
+        ChangeLog.objects.bulk_create([
+            ChangeLog(
+                user_id=user_id, seq=seq, model=label,
+                object_id=pk, deleted=deleted
+            )
+            for seq, pk in enumerate(pks, start=last - len(pks) + 1)
+        ])
+
+
+def changes_since(user_id, since, limit):
+    """Return up to limit log entries of a user after the since cursor"""
+    return list(
+        ChangeLog.objects.filter(user_id=user_id, seq__gt=since)
+        .order_by('seq')[:limit]
+    )
+
+
+def forget_user(user_id):
+    """Drop the change log of a user"""
+    ChangeLog.objects.filter(user_id=user_id).delete()
+    SyncState.objects.filter(pk=user_id).delete()
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import (
+    CachedTokenAuthentication, get_token_cache_timeout
+)
+
+ME_URL = reverse('user:me')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'token-auth-tests',
+    }
+})
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self) -> None:
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='password',
+            name='Test user'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    @override_settings(TOKEN_AUTH_CACHE_TIMEOUT=300)
+    def test_local_cache_timeout(self):
+        """Test a per process cache only keeps tokens for a few seconds"""
+        self.assertEqual(get_token_cache_timeout(), 5)
+
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}):
+            self.assertEqual(get_token_cache_timeout(), 300)
+
+    def test_token_lookup_cached(self):
+        """Test the token is only looked up in the database once"""
+        with self.assertNumQueries(1):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.auth.authenticate_credentials(
+                self.token.key
+            )
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, self.token.key)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected"""
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials('invalid')
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token stops authenticating"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_invalidated(self):
+        """Test a deactivated user stops authenticating"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_manage_user_update_invalidated(self):
+        """Test a user updated through the API is seen by the next request"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(ME_URL)
+
+        res = client.patch(ME_URL, {'name': 'New name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'New name')
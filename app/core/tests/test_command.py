@@ -1,23 +1,114 @@
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.backends.base.base import BaseDatabaseWrapper
 from django.db.utils import OperationalError
 
 from django.test import TestCase
 
+from core.management.commands.wait_for_db import Command
+
+
+class FakeClock:
+    """Monotonic clock only moved forward by sleep()"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
 
 class CommandTest(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        for name in ('monotonic', 'sleep'):
+            patcher = patch(
+                f'core.management.commands.wait_for_db.time.{name}',
+                getattr(self.clock, name)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def call(self, *args):
+        call_command('wait_for_db', *args, stdout=StringIO())
+
+    def failing_connects(self, failures):
+        """Make the first connection attempts fail like a booting server"""
+        connect = BaseDatabaseWrapper.connect
+        calls = []
+
+        def side_effect(wrapper):
+            calls.append(wrapper)
+            if failures is None or len(calls) <= failures:
+                raise OperationalError('the database system is starting up')
+            return connect(wrapper)
+
+        return patch.object(
+            BaseDatabaseWrapper, 'connect', autospec=True,
+            side_effect=side_effect
+        )
+
     def test_wait_for_db_ready(self):
         """ Test waiting for db when db is available """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with self.failing_connects(0) as connect:
+            self.call()
+
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
 
-    @patch('time.sleep', return_value=True)
-    def test_wait_for_db(self, ts):
+    def test_wait_for_db(self):
         """ Test waiting for db """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with self.failing_connects(5) as connect:
+            self.call()
+
+        self.assertEqual(connect.call_count, 6)
+        self.assertEqual(len(self.clock.sleeps), 5)
+
+    def test_backoff_grows_and_is_capped(self):
+        """ Test the waits double from the initial delay up to the cap """
+        with self.failing_connects(8):
+            self.call('--initial-delay', '0.1', '--max-delay', '2')
+
+        for attempt, delay in enumerate(self.clock.sleeps):
+            bound = min(2, 0.1 * 2 ** attempt)
+            self.assertGreaterEqual(delay, bound / 2)
+            self.assertLessEqual(delay, bound)
+        self.assertGreater(self.clock.sleeps[-1], 1)
+
+    def test_backoff_jitter(self):
+        """ Test replicas starting together do not wait the same time """
+        delays = {Command.backoff(3, 0.1, 5) for _ in range(20)}
+
+        self.assertGreater(len(delays), 1)
+
+    def test_timeout(self):
+        """ Test the command gives up once the timeout would be exceeded """
+        with self.failing_connects(None):
+            with self.assertRaises(CommandError):
+                self.call('--timeout', '10', '--max-delay', '1')
+
+        self.assertLessEqual(self.clock.now, 10)
+        self.assertGreater(self.clock.now, 8)
+
+    def test_wait_migrations(self):
+        """ Test waiting until no migration is left to apply """
+        with patch.object(Command, 'pending_migrations') as pm:
+            pm.side_effect = [[('core', '0001_initial')]] * 2 + [[]]
+            self.call('--wait-migrations')
+
+        self.assertEqual(pm.call_count, 3)
+        self.assertEqual(len(self.clock.sleeps), 2)
+
+    def test_no_pending_migrations(self):
+        """ Test the migrations of the test database are all applied """
+        self.call('--wait-migrations')
+
+        self.assertEqual(self.clock.sleeps, [])
@@ -0,0 +1,168 @@
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.tests.test_recipe_api import sample_recipe
+
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class RecipeCountTests(TestCase):
+    """Test recipe_count follows the links of tags and ingredients"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Quick')
+        ]
+        self.lime = Ingredient.objects.create(user=self.user, name='Lime')
+
+    def assertCounts(self, *counts):
+        self.assertEqual(
+            [tag.recipe_count for tag in Tag.objects.order_by('pk')],
+            list(counts)
+        )
+
+    def test_add_remove_clear(self):
+        """Test adding, removing and clearing links from a recipe"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(*self.tags[:2])
+        recipe.tags.add(self.tags[0])
+        self.assertCounts(1, 1, 0)
+
+        recipe.tags.remove(self.tags[1], self.tags[2])
+        self.assertCounts(1, 0, 0)
+
+        recipe.tags.set(self.tags[1:])
+        self.assertCounts(0, 1, 1)
+
+        recipe.tags.clear()
+        self.assertCounts(0, 0, 0)
+
+    def test_reverse_links(self):
+        """Test links changed from the tag side"""
+        recipes = [sample_recipe(self.user, title=str(i)) for i in range(3)]
+        tag = self.tags[0]
+
+        tag.recipe_set.add(*recipes)
+        tag.recipe_set.remove(recipes[0])
+        self.assertCounts(2, 0, 0)
+
+        tag.recipe_set.clear()
+        self.assertCounts(0, 0, 0)
+
+    def test_delete_recipes(self):
+        """Test deleted recipes no longer count"""
+        recipes = [sample_recipe(self.user, title=str(i)) for i in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(*self.tags[:2])
+            recipe.ingredients.add(self.lime)
+
+        recipes[0].delete()
+        self.assertCounts(2, 2, 0)
+
+        Recipe.objects.filter(pk__in=[r.pk for r in recipes[1:]]).delete()
+        self.assertCounts(0, 0, 0)
+        self.lime.refresh_from_db()
+        self.assertEqual(self.lime.recipe_count, 0)
+
+    def test_bulk_writes(self):
+        """Test recipes created and relinked by the bulk endpoint count"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = [
+            {'title': str(i), 'time_minutes': 5, 'price': '1.00',
+             'tags': [tag.pk for tag in self.tags[:2]],
+             'ingredients': [self.lime.pk]}
+            for i in range(3)
+        ]
+        res = client.post(RECIPE_BULK_URL, payload, format='json')
+        self.assertCounts(3, 3, 0)
+
+        res = client.patch(RECIPE_BULK_URL, [
+            {'id': item['id'], 'tags': [self.tags[2].pk, self.tags[1].pk]}
+            for item in res.data[:2]
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCounts(1, 3, 2)
+        self.lime.refresh_from_db()
+        self.assertEqual(self.lime.recipe_count, 3)
+
+    def test_recount(self):
+        """Test the recount command repairs counts gone out of step"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(*self.tags[:2])
+        Tag.objects.filter(pk=self.tags[0].pk).update(recipe_count=5)
+        Recipe.tags.through.objects.create(recipe=recipe, tag=self.tags[2])
+
+        out = StringIO()
+        call_command('recount_recipes', stdout=out)
+
+        self.assertCounts(1, 1, 1)
+        self.assertIn('tags: 2 recounted', out.getvalue())
+        self.assertIn('ingredients: 0 recounted', out.getvalue())
+
+
+class ConcurrentRecipeCountTests(TransactionTestCase):
+    """Test recipe_count stays exact under concurrent writes"""
+
+    def test_concurrent_links(self):
+        """Test concurrent transactions linking and deleting recipes"""
+        user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        tags = [
+            Tag.objects.create(user=user, name=str(i)) for i in range(4)
+        ]
+        threads = 8
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def write(index):
+            try:
+                barrier.wait()
+                for i in range(5):
+                    with transaction.atomic():
+                        recipe = sample_recipe(user, title=f'{index} {i}')
+                        # Overlapping tags, added in opposite orders
+                        linked = tags[index % 2:] if index % 2 else tags[:3]
+                        recipe.tags.add(*reversed(linked))
+                    if i % 2:
+                        with transaction.atomic():
+                            recipe.tags.remove(linked[0])
+                    if i == 4:
+                        recipe.delete()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=write, args=(index,))
+            for index in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.recipe_count, tag.recipe_set.count())
+        self.assertGreater(
+            sum(tag.recipe_count for tag in Tag.objects.all()), 0
+        )
@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashers
+
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(
+    ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1
+)
+class PasswordHashingTests(TestCase):
+    """Test passwords are hashed with the tuned hashers"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.payload = {'email': 'test@gmail.com', 'password': 'password'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+
+    def login(self):
+        response = self.client.post(TOKEN_URL, self.payload)
+        self.user.refresh_from_db()
+        return response
+
+    def test_new_passwords_use_tuned_argon2(self):
+        """Test new passwords are hashed with the configured costs"""
+        hasher = identify_hasher(self.user.password)
+        decoded = hasher.decode(self.user.password)
+
+        self.assertIsInstance(hasher, hashers.TunedArgon2PasswordHasher)
+        self.assertEqual(decoded['time_cost'], 1)
+        self.assertEqual(decoded['memory_cost'], 1024)
+        self.assertEqual(decoded['parallelism'], 1)
+
+    def test_pbkdf2_upgraded_on_login(self):
+        """Test a PBKDF2 hash is replaced by Argon2 on login"""
+        self.user.password = make_password(
+            self.payload['password'], hasher='pbkdf2_sha256'
+        )
+        self.user.save()
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_changed_costs_upgraded_on_login(self):
+        """Test a hash made with other costs is redone on login"""
+        with self.settings(ARGON2_MEMORY_COST=2048):
+            response = self.login()
+
+        decoded = identify_hasher(self.user.password).decode(
+            self.user.password
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(decoded['memory_cost'], 2048)
+
+    def test_hashes_run_in_pool(self):
+        """Test hashing runs in the threads of the hashing pool"""
+        name = hashers.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hash'))
+
+    @override_settings(PASSWORD_HASHING_TIMEOUT=0)
+    def test_busy_pool_rejects_login(self):
+        """Test logins are refused once no place in line is left"""
+        pool = (ThreadPoolExecutor(1), threading.BoundedSemaphore(1))
+        pool[1].acquire()
+
+        with patch.object(hashers, 'get_executor', return_value=pool):
+            response = self.login()
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        pool[0].shutdown()
@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.instrumentation import (
+    REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SERIALIZER_DURATION,
+    RequestMetricsMiddleware
+)
+from core.management.commands.metrics_report import Command
+from core.metrics import (
+    REGISTRY, Counter, Gauge, Registry, archive_snapshot, read_snapshots,
+    write_snapshot
+)
+from core.models import Tag
+
+TAG_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+
+
+def histogram_sample(metric, **labels):
+    """Return the count and sum of a histogram for the given labels"""
+    for sample in metric.collect()['samples']:
+        if sample['labels'] == labels:
+            return sample['value']['count'], sample['value']['sum']
+    return 0, 0
+
+
+class RequestMetricsTests(TestCase):
+    """Test requests are measured by view and action"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password',
+            is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_by_view_and_action(self):
+        """Test latency, queries and serializer time of a list are recorded"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        labels = {'view': 'recipe:tag-list', 'action': 'list'}
+        count, _ = histogram_sample(REQUEST_DURATION, **labels)
+        queries, query_total = histogram_sample(REQUEST_QUERIES, **labels)
+        _, serializer_total = histogram_sample(
+            REQUEST_SERIALIZER_DURATION, **labels
+        )
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            histogram_sample(REQUEST_DURATION, **labels)[0], count + 1
+        )
+        self.assertGreater(
+            histogram_sample(REQUEST_QUERIES, **labels)[1], query_total
+        )
+        self.assertGreater(
+            histogram_sample(REQUEST_SERIALIZER_DURATION, **labels)[1],
+            serializer_total
+        )
+
+    def test_create_recorded_apart_from_list(self):
+        """Test the action of a viewset tells its endpoints apart"""
+        labels = {'view': 'recipe:tag-list', 'action': 'create'}
+        count, _ = histogram_sample(REQUEST_DURATION, **labels)
+
+        self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(
+            histogram_sample(REQUEST_DURATION, **labels)[0], count + 1
+        )
+
+    def test_prometheus_format(self):
+        """Test the metrics endpoint renders the Prometheus text format"""
+        self.client.get(TAG_URL)
+
+        res = self.client.get(METRICS_URL, {'format': 'prometheus'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe:tag-list",'
+            'action="list",le="+Inf"}',
+            body
+        )
+
+    def test_report_command(self):
+        """Test the report lists the endpoints that were requested"""
+        self.client.get(TAG_URL)
+        out = StringIO()
+
+        with patch.object(Command, 'fetch', return_value=REGISTRY.collect()):
+            call_command('metrics_report', '--sort', 'queries', stdout=out)
+
+        self.assertIn('recipe:tag-list list', out.getvalue())
+
+
+class MetricsSnapshotTests(TestCase):
+    """Test the metrics of the workers are summed through METRICS_DIR"""
+
+    def setUp(self) -> None:
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password',
+            is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_metrics_summed_over_workers(self):
+        """Test the metrics endpoint adds the snapshots of other workers"""
+        self.client.get(TAG_URL)
+        labels = {'view': 'recipe:tag-list', 'action': 'list'}
+        count, _ = histogram_sample(REQUEST_DURATION, **labels)
+        # Another worker which handled the same requests
+        with open(os.path.join(self.metrics_dir, '1.json'), 'w') as file:
+            json.dump(REGISTRY.collect(), file)
+
+        with override_settings(METRICS_DIR=self.metrics_dir):
+            res = self.client.get(METRICS_URL, {'format': 'json'})
+
+        merged = {
+            sample['value']['count']
+            for sample in res.data[REQUEST_DURATION.name]['samples']
+            if sample['labels'] == labels
+        }
+        self.assertEqual(merged, {count * 2})
+
+    def test_archive_keeps_counters_of_exited_workers(self):
+        """Test the snapshot of an exited worker is archived without gauges"""
+        registry = Registry()
+        requests = Counter('requests', 'Requests', registry=registry)
+        connections = Gauge('connections', 'Connections', registry=registry)
+        requests.inc(3)
+        connections.set(2)
+        write_snapshot(self.metrics_dir, registry)
+
+        archive_snapshot(self.metrics_dir, os.getpid())
+        write_snapshot(self.metrics_dir, registry)
+        collected = read_snapshots(self.metrics_dir)
+
+        self.assertEqual(collected['requests']['samples'][0]['value'], 6)
+        self.assertEqual(collected['connections']['samples'][0]['value'], 2)
+
+
+class DuplicateQueryHeaderTests(TestCase):
+    """Test the debug headers point out repeated statements"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.request = RequestFactory().get('/')
+
+    def n_plus_one_view(self, request):
+        for _ in range(3):
+            list(Tag.objects.filter(user=self.user))
+        return HttpResponse()
+
+    @override_settings(QUERY_DEBUG_HEADERS=True)
+    def test_duplicate_queries_header(self):
+        """Test statements run more than once are listed with their count"""
+        response = RequestMetricsMiddleware(self.n_plus_one_view)(
+            self.request
+        )
+
+        self.assertEqual(response['X-Queries'].split(';')[0], '3')
+        self.assertTrue(
+            response['X-Duplicate-Queries'].startswith('3x SELECT')
+        )
+
+    @override_settings(QUERY_DEBUG_HEADERS=False)
+    def test_no_headers_by_default(self):
+        """Test the headers are only added when enabled"""
+        response = RequestMetricsMiddleware(self.n_plus_one_view)(
+            self.request
+        )
+
+        self.assertNotIn('X-Queries', response)
+        self.assertNotIn('X-Duplicate-Queries', response)
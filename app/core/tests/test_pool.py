@@ -0,0 +1,176 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+)
+
+from core.db.backends.postgresql_pool.base import DatabaseWrapper, close_pools
+from core.db.pool import POOL_CONNECTS, ConnectionPool, PoolExhausted
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise OSError('server closed the connection unexpectedly')
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection"""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the bookkeeping of the connection pool"""
+
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, 'test', **options)
+
+    def test_connections_reused(self):
+        """Test a released connection is handed out again"""
+        pool = self.make_pool()
+
+        conn = pool.checkout()
+        pool.release(conn)
+
+        self.assertIs(pool.checkout(), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_max_size(self):
+        """Test checkouts wait for a release once the pool is full"""
+        pool = self.make_pool(max_size=1, timeout=5)
+        conn = pool.checkout()
+        threading.Timer(0.1, pool.release, (conn,)).start()
+
+        self.assertIs(pool.checkout(), conn)
+
+    def test_timeout(self):
+        """Test checkouts fail when no connection becomes free in time"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.checkout()
+
+        with self.assertRaises(PoolExhausted):
+            pool.checkout()
+
+    def test_open_transaction_rolled_back(self):
+        """Test connections are released without a transaction in progress"""
+        pool = self.make_pool()
+        conn = pool.checkout()
+        conn.status = TRANSACTION_STATUS_INTRANS
+
+        pool.release(conn)
+
+        self.assertEqual(conn.rollbacks, 1)
+
+    def test_idle_connection_evicted(self):
+        """Test connections idle for too long are closed instead of reused"""
+        pool = self.make_pool(max_idle=60)
+        conn = pool.checkout()
+        pool.release(conn)
+
+        later = time.monotonic() + 61
+        with patch('core.db.pool.time.monotonic', return_value=later):
+            new = pool.checkout()
+
+        self.assertIsNot(new, conn)
+        self.assertTrue(conn.closed)
+
+    def test_old_connection_retired(self):
+        """Test connections past their max age are closed on release"""
+        pool = self.make_pool(max_age=60)
+        conn = pool.checkout()
+
+        later = time.monotonic() + 61
+        with patch('core.db.pool.time.monotonic', return_value=later):
+            pool.release(conn)
+
+        self.assertTrue(conn.closed)
+
+    def test_broken_connection_replaced(self):
+        """Test idle connections failing the health check are replaced"""
+        pool = self.make_pool(check_interval=0)
+        conn = pool.checkout()
+        pool.release(conn)
+        conn.broken = True
+
+        new = pool.checkout()
+
+        self.assertIsNot(new, conn)
+        self.assertTrue(conn.closed)
+
+    def test_discarded_connection_frees_slot(self):
+        """Test discarded connections make room for new ones"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        conn = pool.checkout()
+
+        pool.release(conn, discard=True)
+
+        self.assertIsNot(pool.checkout(), conn)
+
+    def test_close(self):
+        """Test closing the pool closes idle and released connections"""
+        pool = self.make_pool()
+        idle, in_use = pool.checkout(), pool.checkout()
+        pool.release(idle)
+
+        pool.close()
+        pool.release(in_use)
+
+        self.assertTrue(idle.closed)
+        self.assertTrue(in_use.closed)
+
+
+class PooledDatabaseWrapperTests(TestCase):
+    """Test the pooled backend against the test database"""
+
+    def test_connection_returned_to_pool(self):
+        """Test closing the wrapper keeps the connection for the next one"""
+        wrapper = DatabaseWrapper(connection.settings_dict)
+        database = connection.settings_dict['NAME']
+        self.addCleanup(close_pools, database)
+        wrapper.ensure_connection()
+        wrapper.close()
+        connects = POOL_CONNECTS.value(database=database)
+
+        for _ in range(3):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            wrapper.close()
+
+        self.assertEqual(POOL_CONNECTS.value(database=database), connects)
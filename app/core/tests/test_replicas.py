@@ -0,0 +1,188 @@
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import replicas
+from core.db.replicas import ReplicaRouter
+from core.models import Tag
+from recipe.tests.test_recipe_api import sample_recipe
+
+TAG_URL = reverse('recipe:tag-list')
+SYNC_URL = reverse('recipe:sync')
+UPLOADS_URL = reverse('recipe:imageupload-list')
+
+REPLICAS = ['replica1', 'replica2']
+
+# Registered when the tests are collected, so the test runner points them at
+# the test database like configured replicas
+for alias in REPLICAS:
+    connections.databases.setdefault(alias, {
+        **connections.databases['default'],
+        'TEST': {'MIRROR': 'default'},
+    })
+
+
+@override_settings(
+    DATABASE_REPLICAS=REPLICAS,
+    REPLICA_SELECTION='round_robin',
+    REPLICA_MAX_LAG=5,
+)
+class ReplicaTestCase(TestCase):
+    """
+    Tests with two replica aliases mirroring the test database
+
+    The replicas use their own connections, so they do not see the rows
+    created inside the test transaction. Tests check they were queried.
+    """
+    databases = {'default', *REPLICAS}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        replicas.reset_lags()
+
+
+class ReplicaRouterTests(ReplicaTestCase):
+    """Test the choice of the database to read from"""
+
+    def test_outside_requests_use_primary(self):
+        """Test reads and writes outside safe requests use the primary"""
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Tag), 'default')
+        self.assertEqual(router.db_for_write(Tag), 'default')
+        self.assertTrue(router.allow_migrate('default', 'core'))
+        self.assertFalse(router.allow_migrate('replica1', 'core'))
+
+    def test_round_robin(self):
+        """Test replicas are taken in turn"""
+        chosen = [replicas.select_replica() for _ in range(4)]
+
+        self.assertCountEqual(chosen[:2], REPLICAS)
+        self.assertEqual(chosen[:2], chosen[2:])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test everything is read from the primary without replicas"""
+        self.assertIsNone(replicas.select_replica())
+
+    @override_settings(REPLICA_SELECTION='least_lag')
+    def test_least_lag(self):
+        """Test the replica furthest along is picked"""
+        lags = {'replica1': 3.0, 'replica2': 0.5}
+        with patch.object(replicas, 'measure_lag', side_effect=lags.get):
+            self.assertEqual(replicas.select_replica(), 'replica2')
+
+    @override_settings(REPLICA_SELECTION='least_lag')
+    def test_least_lag_skips_late_and_down_replicas(self):
+        """Test replicas down or too far behind are not read from"""
+        with patch.object(replicas, 'measure_lag', side_effect=[None, 60.0]):
+            self.assertIsNone(replicas.select_replica())
+
+    @override_settings(
+        REPLICA_SELECTION='least_lag', REPLICA_LAG_CHECK_INTERVAL=60
+    )
+    def test_lag_is_reused_within_interval(self):
+        """Test the lag of a replica is measured once per interval"""
+        with patch.object(
+            replicas, 'measure_lag', return_value=0.0
+        ) as measure_lag:
+            replicas.select_replica()
+            replicas.select_replica()
+
+        self.assertEqual(measure_lag.call_count, len(REPLICAS))
+
+    def test_measure_lag(self):
+        """Test the lag of a database that is not a standby is 0"""
+        self.assertEqual(replicas.measure_lag('replica1'), 0)
+
+
+class ReplicaApiTests(ReplicaTestCase):
+    """Test safe API requests read from replicas"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def replica_queries(self, method, *args, **kwargs):
+        """Return the response to a request and the replica queries it ran"""
+        with CaptureQueriesContext(connections['replica1']) as first, \
+                CaptureQueriesContext(connections['replica2']) as second:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(first) + len(second)
+
+    def test_safe_requests_read_from_replica(self):
+        """Test listing tags and syncing read from a replica"""
+        for url in (TAG_URL, SYNC_URL):
+            with self.subTest(url=url):
+                response, queries = self.replica_queries('get', url)
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertGreater(queries, 0)
+
+    def test_writes_go_to_primary(self):
+        """Test unsafe requests neither read nor write on replicas"""
+        response, queries = self.replica_queries(
+            'post', TAG_URL, {'name': 'Vegan'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(queries, 0)
+        self.assertTrue(Tag.objects.filter(name='Vegan').exists())
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a user reads their own writes until the window ends"""
+        self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        response, queries = self.replica_queries('get', TAG_URL)
+
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.data['results'][0]['name'], 'Vegan')
+
+        caches['default'].clear()
+        response, queries = self.replica_queries('get', TAG_URL)
+
+        self.assertGreater(queries, 0)
+
+    def test_writes_of_any_view_pin(self):
+        """Test writes of views reading from the primary pin the user too"""
+        recipe = sample_recipe(user=self.user)
+        with tempfile.TemporaryDirectory() as upload_dir:
+            with override_settings(CHUNKED_UPLOAD_DIR=upload_dir):
+                response = self.client.post(
+                    UPLOADS_URL, {'recipe': recipe.id, 'size': 10}
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(replicas.is_pinned(self.user.pk))
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write keeps the user on the replicas"""
+        self.client.post(TAG_URL, {'name': ''})
+
+        self.assertFalse(replicas.is_pinned(self.user.pk))
+
+    def test_other_users_keep_reading_from_replica(self):
+        """Test the window only applies to the user who wrote"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        self.client.post(TAG_URL, {'name': 'Vegan'})
+        self.client.force_authenticate(other)
+
+        response, queries = self.replica_queries('get', TAG_URL)
+
+        self.assertGreater(queries, 0)
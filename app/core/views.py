@@ -1,3 +1,45 @@
-from django.shortcuts import render
+from django.conf import settings
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-# Create your views here.
+from core.authentication import CachedTokenAuthentication
+from core.instrumentation import save_metrics
+from core.metrics import REGISTRY, read_snapshots, to_text
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Render collected metrics in the Prometheus text format"""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = renderer_context and renderer_context.get('response')
+        if response is not None and response.exception:
+            # Errors like a missing token are not metrics
+            return '\n'.join(str(value) for value in data.values()) + '\n'
+        return to_text(data)
+
+
+class MetricsView(APIView):
+    """
+    Report the metrics collected by the workers, for staff users
+
+    Without METRICS_DIR, only the process answering is reported. Prometheus
+    gets the text format from its Accept header, or with
+    ?format=prometheus.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (
+        *api_settings.DEFAULT_RENDERER_CLASSES, PrometheusRenderer
+    )
+
+    def get(self, request):
+        if not settings.METRICS_DIR:
+            return Response(REGISTRY.collect())
+        save_metrics(force=True)
+        return Response(read_snapshots(settings.METRICS_DIR))
@@ -0,0 +1,62 @@
+"""
+Gunicorn settings for serving app.wsgi in production
+
+Run with `gunicorn -c gunicorn.conf.py app.wsgi`. Every setting can be
+overridden from the environment. Send HUP to the master process to reload
+the code and replace the workers gracefully. The hooks below keep the
+metrics snapshots of METRICS_DIR, see core.metrics.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Django views are synchronous, so the usual (2 x cores) + 1 processes with a
+# few threads each keeps every core busy while requests wait on PostgreSQL
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+
+# Idle keep-alive connections are parked by gthread workers without holding
+# a thread. Longer than the proxy's upstream idle timeout, so the proxy
+# always closes first and never reuses a connection being closed.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks can not build up, with jitter
+# so they do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# The heartbeat file lives in memory, a slow disk can get workers killed
+worker_tmp_dir = '/dev/shm'
+
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
+
+metrics_dir = os.environ.get('METRICS_DIR', '')
+
+
+def on_starting(server):
+    """Start counting from zero, pids of a previous run may be reused"""
+    if metrics_dir:
+        from core.metrics import clear_snapshots
+        clear_snapshots(metrics_dir)
+
+
+def worker_exit(server, worker):
+    """Save what the worker recorded since its last snapshot"""
+    if metrics_dir:
+        from core.instrumentation import save_metrics
+        save_metrics(force=True)
+
+
+def child_exit(server, worker):
+    """Keep the counts of an exited worker once its pid can be reused"""
+    if metrics_dir:
+        from core.metrics import archive_snapshot
+        archive_snapshot(metrics_dir, worker.pid)
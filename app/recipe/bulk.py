@@ -0,0 +1,406 @@
+import functools
+from collections import Counter
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core.cache import bump_user_version
+from core.counts import linked_counts, update_recipe_counts
+from core.models import Tag, Ingredient, Recipe
+from core.search import update_search_vectors, recipes_linked_to
+from core.sync import record_changes
+
+RELATED_FIELDS = {
+    'tags': Tag,
+    'ingredients': Ingredient,
+}
+
+
+def _to_int(value):
+    """Return value as an int, or None if it is not an integer"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _add_error(errors, index, field, message):
+    """Add an error message for a field of the item at index"""
+    errors[index] = dict(errors[index])
+    errors[index].setdefault(field, []).append(message)
+
+
+def _link_counts(links):
+    """Return how many of the recipes in links each related id is added to"""
+    return Counter(
+        related_id for related_ids in links.values()
+        for related_id in set(related_ids)
+    )
+
+
+def _create_links(field, links):
+    through = field.remote_field.through
+    recipe_column = f'{field.m2m_field_name()}_id'
+    related_column = f'{field.m2m_reverse_field_name()}_id'
+
+    through.objects.bulk_create([
+        through(**{recipe_column: recipe_id, related_column: related_id})
+        for recipe_id, related_ids in links.items()
+        for related_id in dict.fromkeys(related_ids)
+    ], batch_size=settings.API_BULK_BATCH_SIZE)
+
+
+def insert_recipe_links(field_name, links):
+    """
+    Link recipes to related objects with bulk inserts on the through table
+
+    links maps recipe ids to the list of related ids to add.
+    """
+    field = Recipe._meta.get_field(field_name)
+    _create_links(field, links)
+    update_recipe_counts(field.related_model, _link_counts(links))
+
+
+def update_recipe_links(recipe, field_name, related_ids):
+    """
+    Link a recipe to exactly related_ids through a many to many field
+
+    The ids are diffed against the current links, prefetched ones included,
+    so at most one delete and one insert run and none when nothing changed.
+    m2m_changed is sent as set() sends it, with the removed and added ids.
+    """
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    recipe_column = f'{field.m2m_field_name()}_id'
+    related_column = f'{field.m2m_reverse_field_name()}_id'
+    existing = {obj.pk for obj in getattr(recipe, field_name).all()}
+    requested = set(related_ids)
+    removed, added = existing - requested, requested - existing
+    if not removed and not added:
+        return
+
+    db = router.db_for_write(through, instance=recipe)
+    send = functools.partial(
+        m2m_changed.send, sender=through, instance=recipe, reverse=False,
+        model=field.related_model, using=db
+    )
+    if removed:
+        send(action='pre_remove', pk_set=removed)
+        through.objects.using(db).filter(**{
+            recipe_column: recipe.pk, f'{related_column}__in': removed
+        }).delete()
+        send(action='post_remove', pk_set=removed)
+    if added:
+        send(action='pre_add', pk_set=added)
+        through.objects.using(db).bulk_create([
+            through(**{recipe_column: recipe.pk, related_column: related_id})
+            for related_id in sorted(added)
+        ])
+        send(action='post_add', pk_set=added)
+    getattr(recipe, '_prefetched_objects_cache', {}).pop(field_name, None)
+
+
+def record_bulk_changes(objs):
+    """Log objects written in bulk, which sends no model signals"""
+    if objs:
+        record_changes(
+            objs[0].user_id, type(objs[0]), [obj.pk for obj in objs]
+        )
+
+
+def replace_recipe_links(field_name, links):
+    """Replace the related objects of recipes in one delete and bulk inserts"""
+    field = Recipe._meta.get_field(field_name)
+    # Counted as one change per object, the locks are then taken in one go
+    counts = _link_counts(links)
+    counts.subtract(linked_counts(field_name, list(links)))
+    field.remote_field.through.objects.filter(
+        **{f'{field.m2m_field_name()}__in': list(links)}
+    ).delete()
+    _create_links(field, links)
+    update_recipe_counts(field.related_model, counts)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    List serializer validating and writing all items with bulk queries
+
+    Validation errors are reported per item, in a list aligned with the
+    input where valid items have an empty dict. When an instance queryset
+    is given, items are updates and must carry the id of one of its objects.
+    """
+    default_error_messages = {
+        'max_length': _('Ensure this list has at most {max_length} items.'),
+        'not_found': _('Object not found.'),
+        'duplicate': _('Duplicate id.'),
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(
+                input_type=type(data).__name__
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='not_a_list')
+
+        if not data or len(data) > settings.API_MAX_BULK_SIZE:
+            message = self.error_messages['max_length'].format(
+                max_length=settings.API_MAX_BULK_SIZE
+            ) if data else self.error_messages['empty']
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='max_length' if data else 'empty')
+
+        items = []
+        errors = []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append(None)
+                errors.append(exc.detail)
+
+        self.validate_items(data, items, errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return items
+
+    def validate_items(self, data, items, errors):
+        """Check the items against the database, adding to their errors"""
+        if self.instance is None:
+            return
+
+        existing = self._existing()
+        seen = set()
+        for index, item in enumerate(data):
+            pk = _to_int(item.get('id')) if isinstance(item, dict) else None
+            if pk not in existing:
+                _add_error(
+                    errors, index, 'id', self.error_messages['not_found']
+                )
+            elif pk in seen:
+                _add_error(
+                    errors, index, 'id', self.error_messages['duplicate']
+                )
+            elif items[index] is not None:
+                items[index]['id'] = pk
+            seen.add(pk)
+
+    def _existing(self):
+        """Return the objects being updated by id"""
+        return {obj.pk: obj for obj in self.instance}
+
+
+class BulkRecipeAttrListSerializer(BulkListSerializer):
+    """Bulk writes of tags or ingredients"""
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        with transaction.atomic():
+            objs = model.objects.bulk_create(
+                [model(**attrs) for attrs in validated_data],
+                batch_size=settings.API_BULK_BATCH_SIZE
+            )
+            record_bulk_changes(objs)
+        return objs
+
+    def update(self, instance, validated_data):
+        existing = self._existing()
+        now = timezone.now()
+        objs = []
+        for attrs in validated_data:
+            obj = existing[attrs.pop('id')]
+            for attr, value in attrs.items():
+                setattr(obj, attr, value)
+            # bulk_update() does not apply auto_now
+            obj.updated_at = now
+            objs.append(obj)
+
+        model = self.child.Meta.model
+        with transaction.atomic():
+            model.objects.bulk_update(
+                objs, ['name', 'updated_at'],
+                batch_size=settings.API_BULK_BATCH_SIZE
+            )
+            update_search_vectors(
+                recipes_linked_to(model, [obj.pk for obj in objs]), touch=True
+            )
+            record_bulk_changes(objs)
+        return objs
+
+
+class BulkRecipeListSerializer(BulkListSerializer):
+    """Bulk writes of recipes, related ids are resolved once per relation"""
+
+    def validate_items(self, data, items, errors):
+        super().validate_items(data, items, errors)
+
+        user = self.context['request'].user
+        for field_name, model in RELATED_FIELDS.items():
+            requested = {
+                pk for attrs in items if attrs is not None
+                for pk in attrs.get(field_name, ())
+            }
+            found = set(
+                model.objects.filter(user=user, pk__in=requested)
+                .values_list('pk', flat=True)
+            )
+            for index, attrs in enumerate(items):
+                for pk in attrs.get(field_name, ()) if attrs else ():
+                    if pk not in found:
+                        _add_error(errors, index, field_name, _(
+                            'Invalid pk "{pk_value}" - object does not exist.'
+                        ).format(pk_value=pk))
+
+    @staticmethod
+    def _pop_links(validated_data):
+        """Remove the related ids from the items, by relation and item"""
+        return {
+            field_name: [
+                attrs.pop(field_name, None) for attrs in validated_data
+            ]
+            for field_name in RELATED_FIELDS
+        }
+
+    def create(self, validated_data):
+        links = self._pop_links(validated_data)
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [Recipe(**attrs) for attrs in validated_data],
+                batch_size=settings.API_BULK_BATCH_SIZE
+            )
+            # Logged before the links are counted, in the lock order of the
+            # signals (see core.signals)
+            record_bulk_changes(recipes)
+            for field_name, related_ids in links.items():
+                insert_recipe_links(field_name, {
+                    recipe.pk: ids
+                    for recipe, ids in zip(recipes, related_ids) if ids
+                })
+            update_search_vectors(
+                Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            )
+        return recipes
+
+    def update(self, instance, validated_data):
+        existing = self._existing()
+        recipes = [existing[attrs.pop('id')] for attrs in validated_data]
+        links = self._pop_links(validated_data)
+
+        fields = set()
+        for recipe, attrs in zip(recipes, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            fields.update(attrs)
+
+        with transaction.atomic():
+            if fields:
+                Recipe.objects.bulk_update(
+                    recipes, fields, batch_size=settings.API_BULK_BATCH_SIZE
+                )
+            record_bulk_changes(recipes)
+            for field_name, related_ids in links.items():
+                replace_recipe_links(field_name, {
+                    recipe.pk: ids
+                    for recipe, ids in zip(recipes, related_ids)
+                    if ids is not None
+                })
+            # Also sets updated_at, which bulk_update() leaves alone
+            update_search_vectors(
+                Recipe.objects.filter(
+                    pk__in=[recipe.pk for recipe in recipes]
+                ),
+                touch=True
+            )
+        return recipes
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Serializer for the ids of objects to delete in bulk"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.API_MAX_BULK_SIZE
+    )
+
+    def update(self, instance, validated_data):
+        pass
+
+    def create(self, validated_data):
+        pass
+
+
+class BulkModelMixin:
+    """
+    Create, update or delete many objects of a viewset in one request
+
+    POST takes a list of objects to create, PATCH a list of partial objects
+    with their id and DELETE an {"ids": [...]} object. Writes happen in one
+    transaction and only if every item is valid.
+    """
+    bulk_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'bulk':
+            return self.bulk_serializer_class
+        return super().get_serializer_class()
+
+    def get_bulk_queryset(self):
+        """Return the user's objects the bulk endpoint can change"""
+        return self.queryset.filter(user=self.request.user)
+
+    def get_bulk_response(self, objs, status_code):
+        """Return the response listing the written objects"""
+        queryset = self.get_queryset().filter(pk__in=[obj.pk for obj in objs])
+        serializer = self.serializer_class(queryset, many=True)
+        return Response(serializer.data, status=status_code)
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create, update or delete objects in bulk"""
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        with transaction.atomic():
+            if request.method == 'PATCH':
+                ids = [
+                    item.get('id') for item in request.data
+                    if isinstance(item, dict)
+                ] if isinstance(request.data, list) else []
+                instance = self.get_bulk_queryset().select_for_update().filter(
+                    pk__in=[pk for pk in map(_to_int, ids) if pk is not None]
+                )
+                serializer = self.get_serializer(
+                    instance, data=request.data, many=True, partial=True
+                )
+                serializer.is_valid(raise_exception=True)
+                objs = serializer.save()
+                # Bulk writes do not send the signals bumping the version
+                bump_user_version(request.user.pk)
+                return self.get_bulk_response(objs, status.HTTP_200_OK)
+
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            objs = serializer.save(user=request.user)
+            bump_user_version(request.user.pk)
+            return self.get_bulk_response(objs, status.HTTP_201_CREATED)
+
+    def bulk_destroy(self, request):
+        """Delete the user's objects with the given ids"""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.get_bulk_queryset().filter(
+            pk__in=serializer.validated_data['ids']
+        ).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
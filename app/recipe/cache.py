@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.cache import (
+    get_response_cache, get_user_version, response_cache_enabled,
+    response_cache_key,
+)
+from core.metrics import Counter
+from recipe.conditional import request_representation
+
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    'response_cache_requests_total',
+    'List requests looked up in the response cache, by view and result',
+    ('view', 'result'),
+)
+
+
+class CachedListMixin:
+    """
+    Serve the list action from the cache until the user's data changes
+
+    Responses are keyed by user, the user's version, the view and the
+    normalized query params. Writes bump the version (see core.signals)
+    instead of deleting keys, stale entries expire on their own. Other read
+    only actions can go through cached_response() as well. Nothing is
+    cached with a per process cache unless RESPONSE_CACHE_LOCAL is set.
+    """
+
+    def cached_response(self, request, get_response):
+        """Return get_response(), from the cache when possible"""
+        if not response_cache_enabled():
+            return get_response()
+        cache = get_response_cache()
+        user_id = request.user.pk
+        key = response_cache_key(
+            user_id, get_user_version(user_id),
+            self.basename, self.action, request.get_host(),
+            *request_representation(request)
+        )
+
+        cached = cache.get(key)
+        if cached is not None:
+            RESPONSE_CACHE_REQUESTS.inc(view=self.basename, result='hit')
+            data, headers = cached
+            response = get_conditional_response(
+                request, etag=headers.get('ETag')
+            ) or Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        RESPONSE_CACHE_REQUESTS.inc(view=self.basename, result='miss')
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            headers = {
+                header: response[header]
+                for header in CACHED_HEADERS if response.has_header(header)
+            }
+            cache.set(
+                key, (response.data, headers), settings.RESPONSE_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List the objects, from the cache when possible"""
+        return self.cached_response(
+            request, lambda: super(CachedListMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
@@ -0,0 +1,97 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+
+def _make_etag(*parts):
+    """Return a strong ETag hashing the parts of a representation"""
+    digest = hashlib.sha1(
+        '\n'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def request_representation(request):
+    """Return what besides the data selects the body of a response"""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    return request.accepted_media_type, urlencode(params)
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified validators for the list and retrieve actions
+
+    The validators come from the updated_at field of the model, so a request
+    whose validators still match gets a 304 without running the serializer.
+    Lists are checked against the requested page only, read with one
+    values() query of its keys before the page itself is loaded.
+    """
+
+    def page_state(self, request, queryset):
+        """Return the keys and updated_at of the requested page's objects"""
+        columns = ['pk', 'updated_at']
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        if get_ordering is not None:
+            # The cursor paginator reads its position from the rows
+            for field in get_ordering(request, queryset, self):
+                field = field.lstrip('-')
+                if field not in columns:
+                    columns.append(field)
+        rows = queryset.prefetch_related(None).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return list(rows), None, None
+        return (
+            page, self.paginator.get_next_link(),
+            self.paginator.get_previous_link()
+        )
+
+    def list(self, request, *args, **kwargs):
+        """List the objects unless the client's copy is still fresh"""
+        queryset = self.filter_queryset(self.get_queryset())
+        # The links change when objects enter or leave the page around it,
+        # like a deletion that leaves the latest updated_at unchanged
+        rows, next_link, previous_link = self.page_state(request, queryset)
+        keys = [(row['pk'], row['updated_at']) for row in rows]
+        etag = _make_etag(
+            keys, next_link, previous_link, *request_representation(request)
+        )
+        last_modified = max(
+            (row['updated_at'] for row in rows), default=None
+        )
+
+        # Last-Modified alone can not tell deletions apart, so only the
+        # ETag decides whether a list is fresh
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return _set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve an object unless the client's copy is still fresh"""
+        instance = self.get_object()
+        etag = _make_etag(
+            instance.pk, instance.updated_at, *request_representation(request)
+        )
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(instance.updated_at.timestamp())
+        )
+        if response is None:
+            serializer = self.get_serializer(instance)
+            response = Response(serializer.data)
+        return _set_validators(response, etag, instance.updated_at)
@@ -0,0 +1,199 @@
+"""
+Read only fast path of the list actions
+
+A ListPlan is compiled once per serializer class and keyword arguments
+from its fields. Lists then read values() dicts, one values_list() query
+per many to many relation, and build the same items the serializer would
+without creating field or model instances. Serializers with fields the
+plan does not know keep going through the serializer.
+"""
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from core.instrumentation import serializer_timer
+
+# Fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.SlugField,
+    serializers.URLField,
+)
+
+# Fields whose representation only depends on the value and the field
+CONVERTED_FIELDS = (
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.UUIDField,
+)
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def _model_field(model, source):
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def _converting_getter(column, convert):
+    def get(row, related):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def _related_getter(pk_column, source):
+    def get(row, related):
+        return related[source].get(row[pk_column], [])
+    return get
+
+
+class ListPlan:
+    """How to build the items of a serializer from values() dicts"""
+
+    def __init__(self, model, columns, getters, relations):
+        self.model = model
+        # Columns read with values()
+        self.columns = columns
+        # (name, get(row, related)) in the serializer's field order
+        self.getters = getters
+        # Many to many fields read as lists of primary keys, by name
+        self.relations = relations
+
+    def related_pks(self, source, pks):
+        """Return the related primary keys of each object, in pk order"""
+        field = self.relations[source]
+        through = field.remote_field.through
+        meta = through._meta
+        own = meta.get_field(field.m2m_field_name()).attname
+        other = meta.get_field(field.m2m_reverse_field_name()).attname
+        related = {}
+        links = (
+            through.objects.filter(**{f'{own}__in': pks})
+            .order_by(other).values_list(own, other)
+        )
+        for pk, related_pk in links:
+            related.setdefault(pk, []).append(related_pk)
+        return related
+
+    def build(self, rows):
+        """Return the serialized items of values() rows"""
+        pk_column = self.model._meta.pk.attname
+        related = {}
+        if rows and self.relations:
+            pks = [row[pk_column] for row in rows]
+            related = {
+                source: self.related_pks(source, pks)
+                for source in self.relations
+            }
+        getters = self.getters
+        return [
+            {name: get(row, related) for name, get in getters}
+            for row in rows
+        ]
+
+
+def compile_plan(serializer_class, **kwargs):
+    """Return the ListPlan of a model serializer, None if it has none"""
+    meta = getattr(serializer_class, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is None:
+        return None
+    pk_column = model._meta.pk.attname
+
+    columns = [pk_column]
+    getters = []
+    relations = {}
+    for name, field in serializer_class(**kwargs).fields.items():
+        if field.write_only:
+            continue
+        model_field = _model_field(model, field.source)
+        if model_field is None:
+            return None
+
+        if isinstance(field, ManyRelatedField):
+            child = field.child_relation
+            if (not isinstance(child, PrimaryKeyRelatedField) or
+                    child.pk_field is not None or
+                    not isinstance(model_field, models.ManyToManyField)):
+                return None
+            relations[field.source] = model_field
+            getters.append((name, _related_getter(pk_column, field.source)))
+            continue
+
+        if not model_field.concrete or model_field.is_relation:
+            return None
+        column = model_field.attname
+        if type(field) in PLAIN_FIELDS:
+            getters.append(
+                (name, lambda row, related, column=column: row[column])
+            )
+        elif type(field) in CONVERTED_FIELDS:
+            getters.append((
+                name, _converting_getter(column, field.to_representation)
+            ))
+        else:
+            return None
+        if column not in columns:
+            columns.append(column)
+
+    return ListPlan(model, columns, getters, relations)
+
+
+def get_plan(serializer_class, **kwargs):
+    """Return the ListPlan of a serializer class, compiled on first use"""
+    key = (serializer_class, tuple(sorted(kwargs.items())))
+    with _plans_lock:
+        if key not in _plans:
+            _plans[key] = compile_plan(serializer_class, **kwargs)
+        return _plans[key]
+
+
+class FastListMixin:
+    """
+    List from values() when the serializer has a ListPlan
+
+    The items are the ones the serializer returns, in the same order, so a
+    response renders to the same bytes. API_FAST_LISTS turns it off.
+    """
+
+    def get_list_plan(self):
+        """Return the ListPlan of the list, None to use the serializer"""
+        return get_plan(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        """List the objects without instantiating models or serializers"""
+        plan = self.get_list_plan()
+        if plan is None or not settings.API_FAST_LISTS:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = list(plan.columns)
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        if get_ordering is not None:
+            # The cursor paginator reads its position from the rows
+            for field in get_ordering(request, queryset, self):
+                field = field.lstrip('-')
+                if field not in columns:
+                    columns.append(field)
+        rows = queryset.prefetch_related(None).values(*columns)
+
+        page = self.paginate_queryset(rows)
+        with serializer_timer():
+            data = plan.build(page if page is not None else list(rows))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,37 @@
+from django.db.models import Count, Exists, OuterRef
+
+from core.models import Recipe
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+
+def filter_by_related(queryset, field_name, ids, match=MATCH_ANY):
+    """
+    Filter recipes by the ids of objects linked through a many to many field
+
+    With MATCH_ANY a recipe is kept when it is linked to at least one of the
+    ids, with MATCH_ALL when it is linked to all of them. Both compile to a
+    subquery on the through table, so recipes are never duplicated.
+    """
+    field = Recipe._meta.get_field(field_name)
+    recipe_column = field.m2m_field_name()
+    related_column = field.m2m_reverse_field_name()
+    ids = set(ids)
+    links = field.remote_field.through.objects.filter(
+        **{f'{related_column}__in': ids}
+    )
+
+    if match == MATCH_ALL:
+        # The through table is unique on (recipe, related), so a recipe
+        # linked to every id has exactly len(ids) matching rows
+        matching = links.values(recipe_column) \
+            .annotate(matched=Count(related_column)) \
+            .filter(matched=len(ids)) \
+            .values(recipe_column)
+        return queryset.filter(pk__in=matching)
+
+    return queryset.filter(
+        Exists(links.filter(**{recipe_column: OuterRef('pk')}))
+    )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """Keyset pagination with a bounded, client adjustable page size"""
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """Paginate tags and ingredients by name, or most used first"""
+    ordering = ('-name', 'id')
+    usage_ordering = ('-recipe_count', '-name', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('ordering') == 'usage':
+            return self.usage_ordering
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """Paginate recipes newest first, or by rank for search results"""
+    ordering = ('-id',)
+    search_ordering = ('-rank', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if 'rank' in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
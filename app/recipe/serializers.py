@@ -1,9 +1,25 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
-
-
-class TagSerializer(serializers.ModelSerializer):
+from core.images import (
+    delete_image_files_on_commit, schedule_image_processing,
+    sniff_image_format
+)
+from core.instrumentation import TimedSerializerMixin
+from core.models import ImageStatus, ImageUpload, Tag, Ingredient, Recipe
+from recipe.bulk import (
+    RELATED_FIELDS, BulkRecipeAttrListSerializer, BulkRecipeListSerializer,
+    update_recipe_links
+)
+from recipe.fields import (
+    ImageVariantsField, RecipeImageField, UserPrimaryKeyRelatedField
+)
+from recipe.sparse import SparseFieldsSerializerMixin
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -12,7 +28,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredient objects"""
 
     class Meta:
@@ -21,14 +37,29 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagBulkSerializer(TagSerializer):
+    """Serializer for tag items of bulk writes"""
+
+    class Meta(TagSerializer.Meta):
+        list_serializer_class = BulkRecipeAttrListSerializer
+
+
+class IngredientBulkSerializer(IngredientSerializer):
+    """Serializer for ingredient items of bulk writes"""
+
+    class Meta(IngredientSerializer.Meta):
+        list_serializer_class = BulkRecipeAttrListSerializer
+
+
+class RecipeSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for recipe objects"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -37,18 +68,133 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'link')
         read_only_fields = ('id',)
+        # Relations ?expand= returns as objects instead of ids
+        expandable = {
+            'ingredients': IngredientSerializer,
+            'tags': TagSerializer,
+        }
+
+    def update(self, instance, validated_data):
+        """
+        Update the recipe, writing only the links that changed
+
+        The links are diffed against the ones loaded with the recipe, so it
+        is expected to be locked, as RecipeViewSet does. The recipe row is
+        not saved when only its links change.
+        """
+        links = {
+            field_name: validated_data.pop(field_name)
+            for field_name in RELATED_FIELDS if field_name in validated_data
+        }
+        with transaction.atomic():
+            if validated_data:
+                instance = super().update(instance, validated_data)
+            for field_name, objs in links.items():
+                update_recipe_links(
+                    instance, field_name, [obj.pk for obj in objs]
+                )
+        return instance
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize recipe detail"""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    image = RecipeImageField(read_only=True)
+    image_variants = ImageVariantsField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'image', 'image_status', 'image_variants'
+        )
+        read_only_fields = ('id', 'image', 'image_status')
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serializer for recipe items of bulk writes, checking ids in bulk"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        list_serializer_class = BulkRecipeListSerializer
+
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for updating images to recipe"""
+    image = RecipeImageField(allow_empty_file=False)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'image_variants')
+        read_only_fields = ('id', 'image_status')
+
+    def validate_image(self, image):
+        """Check the size and leading bytes, decoding is left to the worker"""
+        if image.size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Ensure the image is at most %(size)d bytes.')
+                % {'size': settings.RECIPE_IMAGE_MAX_SIZE}
+            )
+
+        header = image.read(16)
+        image.seek(0)
+        if sniff_image_format(header) is None:
+            raise serializers.ValidationError(
+                _('Upload a valid JPEG, PNG, GIF or WebP image.')
+            )
+
+        return image
+
+    def update(self, instance, validated_data):
+        """Store the upload as is and process it in the background"""
+        validated_data.update(
+            image_status=ImageStatus.PENDING, image_variants={}
+        )
+        with transaction.atomic():
+            delete_image_files_on_commit(instance)
+            recipe = super().update(instance, validated_data)
+            schedule_image_processing(recipe.pk)
+        return recipe
+
+
+class ImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for chunked recipe image uploads"""
+    recipe = UserPrimaryKeyRelatedField(queryset=Recipe.objects.all())
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'recipe', 'size', 'offset', 'created_at')
+        read_only_fields = ('id', 'offset', 'created_at')
+
+    def validate_size(self, size):
+        """Check the declared size before any byte is uploaded"""
+        if not 0 < size <= settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Ensure the image is at most %(size)d bytes.')
+                % {'size': settings.RECIPE_IMAGE_MAX_SIZE}
+            )
+        return size
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Serializer for the query params of the delta sync endpoint"""
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SYNC_MAX_CHANGES,
+        default=settings.SYNC_MAX_CHANGES
+    )
+
+    def update(self, instance, validated_data):
+        pass
+
+    def create(self, validated_data):
+        pass
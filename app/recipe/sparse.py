@@ -0,0 +1,98 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from recipe.fast import get_plan
+
+_field_names = {}
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer taking fields and expand keyword arguments
+
+    fields keeps only the named fields. expand replaces the primary keys of
+    the relations named in Meta.expandable by the nested objects.
+    """
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.Meta.expandable[name](
+                many=True, read_only=True
+            )
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def get_field_names(serializer_class):
+    """Return the names of the fields a serializer class outputs"""
+    if serializer_class not in _field_names:
+        _field_names[serializer_class] = tuple(
+            name for name, field in serializer_class().fields.items()
+            if not field.write_only
+        )
+    return _field_names[serializer_class]
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= and ?expand= on the list and retrieve actions
+
+    fields is a comma separated subset of the serializer's fields, expand
+    the relations to return as nested objects instead of primary keys.
+    get_queryset() can use get_fieldset() to load only what is returned.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def _parse_names(self, param, allowed):
+        value = self.request.query_params.get(param, '')
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        if not names:
+            return None
+        unknown = sorted(names.difference(allowed))
+        if unknown:
+            raise ValidationError({
+                param: _('Unknown names: %(names)s. Expected some of: '
+                         '%(allowed)s') % {
+                    'names': ', '.join(unknown),
+                    'allowed': ', '.join(allowed),
+                }
+            })
+        # In a single order, one ListPlan serves every order of the names
+        return tuple(name for name in allowed if name in names)
+
+    def get_fieldset(self):
+        """Return the fields and expand serializer kwargs of the request"""
+        if self.action not in self.sparse_actions:
+            return {}
+        if not hasattr(self, '_fieldset'):
+            serializer_class = self.get_serializer_class()
+            fieldset = {}
+            fields = self._parse_names(
+                'fields', get_field_names(serializer_class)
+            )
+            if fields is not None:
+                fieldset['fields'] = fields
+            expand = self._parse_names(
+                'expand', tuple(serializer_class.Meta.expandable)
+            )
+            if expand is not None:
+                fieldset['expand'] = expand
+            self._fieldset = fieldset
+        return self._fieldset
+
+    def get_requested(self, name):
+        """Return whether the response includes the field with this name"""
+        fields = self.get_fieldset().get('fields')
+        return fields is None or name in fields
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **self.get_fieldset(), **kwargs)
+
+    def get_list_plan(self):
+        # Nested objects are only built by the serializers
+        fieldset = self.get_fieldset()
+        if 'expand' in fieldset:
+            return None
+        return get_plan(self.get_serializer_class(), **fieldset)
@@ -0,0 +1,73 @@
+"""
+Recipe statistics computed by the database
+
+The whole response is one json_build_object() query over the filtered
+recipes: totals, then one grouped aggregate per many to many relation, so
+clients get counts, times and price ranges without listing the recipes.
+"""
+from django.db import connections
+
+from core.models import Recipe
+
+# Relations grouped on, by response key
+RELATIONS = ('tags', 'ingredients')
+
+
+def _summary(alias):
+    """Return the json of the time and price aggregates of recipes alias"""
+    # Prices are text like the serializers return them, numeric would lose
+    # its scale once decoded to a float
+    return (
+        f"'recipes', count({alias}.id), "
+        f"'time_minutes', json_build_object("
+        f"'min', min({alias}.time_minutes), "
+        f"'max', max({alias}.time_minutes), "
+        f"'avg', round(avg({alias}.time_minutes), 1)), "
+        f"'price', json_build_object("
+        f"'min', min({alias}.price)::text, "
+        f"'max', max({alias}.price)::text, "
+        f"'avg', round(avg({alias}.price), 2)::text)"
+    )
+
+
+def _relation_sql(connection, name):
+    """Return the subquery listing the stats of each object of a relation"""
+    qn = connection.ops.quote_name
+    field = Recipe._meta.get_field(name)
+    through = field.remote_field.through._meta
+    related = field.related_model._meta
+    recipe_column = through.get_field(field.m2m_field_name()).column
+    related_column = through.get_field(field.m2m_reverse_field_name()).column
+    # json_agg() can not be nested in the grouped aggregates, so the groups
+    # are built first and folded into a list by an outer query
+    return (
+        f"SELECT coalesce(json_agg(g.item ORDER BY g.recipes DESC, g.id), "
+        f"'[]') FROM ("
+        f"SELECT o.id, count(r.id) AS recipes, json_build_object("
+        f"'id', o.id, 'name', o.name, {_summary('r')}) AS item "
+        f"FROM filtered r "
+        f"JOIN {qn(through.db_table)} l ON l.{qn(recipe_column)} = r.id "
+        f"JOIN {qn(related.db_table)} o ON o.id = l.{qn(related_column)} "
+        f"GROUP BY o.id) g"
+    )
+
+
+def recipe_stats(queryset):
+    """Return the statistics of the recipes of queryset in one query"""
+    connection = connections[queryset.db]
+    filtered, params = (
+        queryset.order_by().values('id', 'time_minutes', 'price')
+        .query.sql_with_params()
+    )
+    relations = ', '.join(
+        f"'{name}', ({_relation_sql(connection, name)})"
+        for name in RELATIONS
+    )
+    sql = (
+        f"WITH filtered AS ({filtered}) "
+        f"SELECT json_build_object({_summary('r')}, {relations}) "
+        f"FROM filtered r"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
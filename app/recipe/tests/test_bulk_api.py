@@ -0,0 +1,180 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.tests.test_recipe_api import sample_recipe
+
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+TAG_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENT_BULK_URL = reverse('recipe:ingredient-bulk')
+
+
+class PublicBulkApiTest(TestCase):
+    """Test unauthenticated bulk API access"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.post(RECIPE_BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTest(TestCase):
+    """Test authenticated bulk API access"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Tofu'
+        )
+
+    def recipe_payload(self, index):
+        return {
+            'title': f'Recipe {index}',
+            'time_minutes': 10 + index,
+            'price': '5.00',
+            'tags': [self.tag.id],
+            'ingredients': [self.ingredient.id],
+        }
+
+    def create_recipes(self, count):
+        """Bulk create recipes and return the number of queries run"""
+        payload = [self.recipe_payload(i) for i in range(count)]
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_bulk_create_recipes(self):
+        """Test creating recipes with their tags and ingredients in bulk"""
+        payload = [self.recipe_payload(i) for i in range(3)]
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test bulk creating recipes does not run queries per recipe"""
+        self.assertEqual(self.create_recipes(2), self.create_recipes(20))
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by index and nothing is written"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        other_tag = Tag.objects.create(user=other_user, name='Other')
+        payload = [
+            self.recipe_payload(0),
+            {**self.recipe_payload(1), 'tags': [other_tag.id]},
+            {**self.recipe_payload(2), 'title': ''},
+        ]
+
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tags', res.data[1])
+        self.assertIn('title', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_rejects_non_list(self):
+        """Test the bulk endpoint requires a list"""
+        res = self.client.post(
+            RECIPE_BULK_URL, self.recipe_payload(0), format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """Test updating recipes and their links in bulk"""
+        recipe1 = sample_recipe(user=self.user, title='Curry')
+        recipe1.tags.add(self.tag)
+        recipe2 = sample_recipe(user=self.user, title='Stew')
+        new_tag = Tag.objects.create(user=self.user, name='Spicy')
+        payload = [
+            {'id': recipe1.id, 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'title': 'Beef stew'},
+        ]
+
+        res = self.client.patch(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Curry')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(recipe2.title, 'Beef stew')
+
+    def test_bulk_update_other_user_recipe(self):
+        """Test recipes of other users can not be updated"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        recipe = sample_recipe(user=other_user, title='Curry')
+
+        res = self.client.patch(
+            RECIPE_BULK_URL, [{'id': recipe.id, 'title': 'Stew'}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Curry')
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting the user's recipes in bulk"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        kept = sample_recipe(user=self.user)
+
+        res = self.client.delete(
+            RECIPE_BULK_URL, {'ids': [recipe1.id, recipe2.id]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+
+    def test_bulk_tags_and_ingredients(self):
+        """Test creating, renaming and deleting tags and ingredients in bulk"""
+        res = self.client.post(
+            TAG_BULK_URL, [{'name': 'Dessert'}, {'name': 'Breakfast'}],
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+        res = self.client.patch(
+            INGREDIENT_BULK_URL,
+            [{'id': self.ingredient.id, 'name': 'Silken tofu'}],
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.name, 'Silken tofu')
+
+        res = self.client.delete(
+            TAG_BULK_URL, {'ids': [self.tag.id]}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Tag.objects.filter(id=self.tag.id).exists())
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import get_response_cache
+from core.models import Tag
+from recipe.tests.test_recipe_api import sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+TAG_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetApiTests(TestCase):
+    """Test ETag and Last-Modified handling of the recipe APIs"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def assertChanged(self, url, etag):
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_not_modified(self):
+        """Test a matching If-None-Match is answered with one query"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        get_response_cache().clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+
+    def test_list_validator_scoped_to_page(self):
+        """Test changes outside the requested page keep its ETag"""
+        sample_recipe(user=self.user, title='Newer recipe')
+        params = {'page_size': 1}
+        etag = self.client.get(RECIPE_URL, params)['ETag']
+
+        self.recipe.title = 'Renamed recipe'
+        self.recipe.save()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPE_URL, params, HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+
+    def test_list_etag_depends_on_params(self):
+        """Test lists with other query params get other ETags"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_changes_on_tag_link(self):
+        """Test linking a tag to a recipe changes the recipe list"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.recipe.tags.add(self.tag)
+
+        self.assertChanged(RECIPE_URL, etag)
+
+    def test_list_changes_on_delete(self):
+        """Test deleting a recipe older than the latest one changes the list"""
+        sample_recipe(user=self.user, title='Newer recipe')
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.recipe.delete()
+
+        self.assertChanged(RECIPE_URL, etag)
+
+    def test_list_changes_on_bulk_update(self):
+        """Test bulk updates change the ETag of the list"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.client.patch(RECIPE_BULK_URL, [
+            {'id': self.recipe.id, 'tags': [self.tag.id]}
+        ], format='json')
+
+        self.assertChanged(RECIPE_URL, etag)
+
+    def test_assigned_tags_change(self):
+        """Test tags becoming assigned change the assigned only tag list"""
+        other = Tag.objects.create(user=self.user, name='Dessert')
+        self.recipe.tags.add(self.tag)
+        url = f'{TAG_URL}?assigned_only=1'
+        etag = self.client.get(url)['ETag']
+
+        self.recipe.tags.set([other])
+
+        self.assertChanged(url, etag)
+
+    def test_detail_not_modified(self):
+        """Test a fresh recipe detail is not sent again"""
+        res = self.client.get(detail_url(self.recipe.id))
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(
+            res['Last-Modified'], http_date(self.recipe.updated_at.timestamp())
+        )
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_changes_on_tag_rename(self):
+        """Test renaming a tag changes the detail of its recipes"""
+        self.recipe.tags.add(self.tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
@@ -0,0 +1,122 @@
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.cache import get_response_cache
+from core.models import Tag, Ingredient, Recipe
+from core.renderers import FastJSONRenderer
+from recipe import serializers
+from recipe.fast import get_plan
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+class FastListApiTests(TestCase):
+    """Test the fast list path returns what the serializers return"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Curry   night', 'Café 🍰')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Lime', 'Chicken', 'Rice')
+        ]
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Lime curry {i}', time_minutes=i,
+                price=Decimal('10.5') + i, link='' if i % 2 else 'https://x.y'
+            )
+            # Linked in reverse pk order, lists still come in pk order
+            recipe.tags.add(*reversed(tags[i % 3:]))
+            recipe.ingredients.add(*ingredients[:i % 4])
+
+    def assertSameResponse(self, url, params=None):
+        """Assert the fast path renders the bytes of the serializer path"""
+        get_response_cache().clear()
+        with self.settings(API_FAST_LISTS=False):
+            slow = self.client.get(url, params)
+        get_response_cache().clear()
+        fast = self.client.get(url, params)
+
+        self.assertEqual(slow.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, JSONRenderer().render(slow.data))
+        return fast
+
+    def test_tags_and_ingredients(self):
+        """Test tag and ingredient lists match the serializer output"""
+        self.assertSameResponse(TAG_URL)
+        self.assertSameResponse(TAG_URL, {'assigned_only': 1})
+        self.assertSameResponse(INGREDIENT_URL)
+
+    def test_recipes(self):
+        """Test recipe lists match, related ids and prices included"""
+        res = self.assertSameResponse(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertEqual(res.data['results'][0]['price'], '14.50')
+        self.assertSameResponse(RECIPE_URL, {'search': 'curry'})
+
+    def test_recipe_pages(self):
+        """Test every page and cursor of a paginated list match"""
+        res = self.assertSameResponse(RECIPE_URL, {'page_size': 2})
+
+        while res.data['next']:
+            res = self.assertSameResponse(res.data['next'])
+
+    def test_plan_only_for_known_fields(self):
+        """Test serializers with other fields keep the serializer path"""
+        self.assertIsNotNone(get_plan(serializers.RecipeSerializer))
+        self.assertIsNone(get_plan(serializers.RecipeImageSerializer))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast renderer writes the bytes JSONRenderer writes"""
+
+    def test_same_bytes(self):
+        data = OrderedDict([
+            ('text', 'Café 🍰 "quoted" \\ \u2028 \u2029 \n'),
+            ('lazy', gettext_lazy('Lime')),
+            ('decimal', Decimal('10.50')),
+            ('datetime', timezone.make_aware(
+                datetime.datetime(2021, 5, 1, 12, 30, 15, 123456)
+            )),
+            ('date', datetime.date(2021, 5, 1)),
+            ('uuid', uuid.UUID(int=1)),
+            ('numbers', [0, -1, 2 ** 40, 0.5, True, None]),
+            ('keys', {1: 'one'}),
+        ])
+
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_indent_falls_back(self):
+        """Test indented output is left to JSONRenderer"""
+        data = {'a': [1, 2]}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
@@ -0,0 +1,233 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageStatus, ImageUpload, Recipe
+from recipe import uploads
+
+UPLOADS_URL = reverse('recipe:imageupload-list')
+
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+def detail_url(upload_id):
+    """Return the URL of a chunked upload"""
+    return reverse('recipe:imageupload-detail', args=[upload_id])
+
+
+def commit_url(upload_id):
+    """Return the URL committing a chunked upload"""
+    return reverse('recipe:imageupload-commit', args=[upload_id])
+
+
+def sample_image(size=(64, 64)):
+    """Return the bytes of a generated JPEG image"""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class PrivateImageUploadApiTests(TestCase):
+    """Test resumable chunked uploads of recipe images"""
+
+    def setUp(self) -> None:
+        self.upload_dir = tempfile.mkdtemp()
+        settings_override = override_settings(
+            CHUNKED_UPLOAD_DIR=self.upload_dir
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test_user@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5.00
+        )
+        self.image = sample_image()
+
+    def tearDown(self) -> None:
+        self.recipe.refresh_from_db()
+        for path in self.recipe.image_variants.values():
+            default_storage.delete(path)
+        if self.recipe.image:
+            self.recipe.image.delete()
+
+    def create_upload(self, size=None):
+        res = self.client.post(UPLOADS_URL, {
+            'recipe': self.recipe.id,
+            'size': len(self.image) if size is None else size,
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def send_chunk(self, upload_id, data, offset):
+        return self.client.generic(
+            'PATCH', detail_url(upload_id), data,
+            content_type=CHUNK_CONTENT_TYPE, HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_resume_and_commit_upload(self):
+        """Test an image sent in chunks is resumed and attached to a recipe"""
+        upload_id = self.create_upload()
+        half = len(self.image) // 2
+
+        res = self.send_chunk(upload_id, self.image[:half], 0)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Upload-Offset'], str(half))
+
+        res = self.client.get(detail_url(upload_id))
+        self.assertEqual(res.data['offset'], half)
+
+        res = self.send_chunk(upload_id, self.image[half:], half)
+        self.assertEqual(res.data['offset'], len(self.image))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(commit_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (64, 64))
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_resent_chunk_overwrites_tail(self):
+        """Test bytes of an interrupted chunk are overwritten on resume"""
+        upload_id = self.create_upload()
+        upload = ImageUpload.objects.get(pk=upload_id)
+        self.send_chunk(upload_id, self.image[:100], 0)
+        with open(upload.path, 'ab') as file:
+            file.write(b'partial write')
+
+        self.send_chunk(upload_id, self.image[100:], 100)
+
+        with open(upload.path, 'rb') as file:
+            self.assertEqual(file.read(), self.image)
+
+    def test_offset_mismatch(self):
+        """Test a chunk at the wrong offset is rejected with a conflict"""
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, self.image[:100], 0)
+
+        res = self.send_chunk(upload_id, self.image[200:], 200)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(ImageUpload.objects.get(pk=upload_id).offset, 100)
+
+    def test_offset_checked_again_once_received(self):
+        """Test a chunk is rejected if another one got in while it arrived"""
+        upload_id = self.create_upload()
+        receive_chunk = uploads._receive_chunk
+
+        def receive_slowly(upload, *args):
+            written = receive_chunk(upload, *args)
+            ImageUpload.objects.filter(pk=upload.pk).update(offset=100)
+            return written
+
+        with patch.object(uploads, '_receive_chunk', receive_slowly):
+            res = self.send_chunk(upload_id, self.image[:100], 0)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_first_chunk_not_an_image(self):
+        """Test uploads that do not start like an image are rejected"""
+        upload_id = self.create_upload()
+
+        res = self.send_chunk(upload_id, b'just some text, not an image', 0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.get(pk=upload_id).offset, 0)
+
+    def test_chunk_past_declared_size(self):
+        """Test chunks can not grow an upload past its declared size"""
+        upload_id = self.create_upload(size=100)
+
+        res = self.send_chunk(upload_id, self.image[:200], 0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1024)
+    def test_declared_size_too_large(self):
+        """Test uploads larger than the image limit are refused upfront"""
+        res = self.client.post(UPLOADS_URL, {
+            'recipe': self.recipe.id, 'size': 2048
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_commit_incomplete_upload(self):
+        """Test an upload can not be committed before all bytes arrived"""
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, self.image[:100], 0)
+
+        res = self.client.post(commit_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_other_users_recipe(self):
+        """Test uploads can only target recipes of the user"""
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=other, title='Other recipe', time_minutes=5, price=1.00
+        )
+
+        res = self.client.post(UPLOADS_URL, {'recipe': recipe.id, 'size': 10})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_upload_removes_file(self):
+        """Test abandoning an upload removes its partial file"""
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, self.image[:100], 0)
+
+        res = self.client.delete(detail_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_expired_uploads(self):
+        """Test abandoned uploads expire and are cleaned up with their files"""
+        upload_id = self.create_upload()
+        self.send_chunk(upload_id, self.image[:100], 0)
+        ImageUpload.objects.filter(pk=upload_id).update(
+            created_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        stray = os.path.join(self.upload_dir, 'stray.part')
+        open(stray, 'wb').close()
+        os.utime(stray, (time.time() - 3 * 24 * 3600,) * 2)
+
+        res = self.client.post(commit_url(upload_id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        out = StringIO()
+        call_command('expire_uploads', stdout=out)
+
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        self.assertIn('1 expired uploads and 1 stray files', out.getvalue())
@@ -1,16 +1,25 @@
+import datetime
 import tempfile
 import os
+from io import StringIO
 
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageStatus, Recipe, Tag, Ingredient
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
@@ -81,7 +90,7 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, 200)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -98,8 +107,28 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_recipes_paginated(self):
+        """Test recipes are paginated newest first"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(3)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[2].id, recipes[1].id]
+        )
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipes[0].id]
+        )
+        self.assertIsNone(res.data['next'])
+        self.assertIsNotNone(res.data['previous'])
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -114,6 +143,116 @@ class PrivateRecipeApiTest(TestCase):
 
         self.assertEqual(res.data, serializer.data)
 
+    def _count_queries(self, url):
+        """Return the number of queries run while getting the url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def _sample_full_recipe(self, index):
+        """Create a recipe with its own tags and ingredients"""
+        recipe = sample_recipe(user=self.user, title=f'Recipe {index}')
+        recipe.tags.add(
+            sample_tag(user=self.user, name=f'Tag {index}a'),
+            sample_tag(user=self.user, name=f'Tag {index}b'),
+        )
+        recipe.ingredients.add(
+            sample_ingredient(user=self.user, name=f'Ingredient {index}')
+        )
+        return recipe
+
+    def test_list_recipes_query_count_is_constant(self):
+        """Test listing recipes does not run a query per recipe"""
+        for i in range(2):
+            self._sample_full_recipe(i)
+        few = self._count_queries(RECIPE_URL)
+
+        for i in range(2, 12):
+            self._sample_full_recipe(i)
+        many = self._count_queries(RECIPE_URL)
+
+        self.assertEqual(few, many)
+
+    def test_view_recipe_detail_query_count(self):
+        """Test retrieving a recipe loads nested objects in bulk"""
+        recipe = self._sample_full_recipe(0)
+        for i in range(1, 6):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Extra {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Extra {i}')
+            )
+
+        # recipe, tags and ingredients
+        with self.assertNumQueries(3):
+            self.client.get(detail_url(recipe.id))
+
+    def test_filter_recipes_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all only returns recipes having every tag"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        both = sample_recipe(user=self.user, title='Vegan brownies')
+        both.tags.add(tag1, tag2)
+        one = sample_recipe(user=self.user, title='Vegan curry')
+        one.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': f'{tag1.id},{tag2.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [both.id])
+
+    def test_filter_recipes_matching_all_tags_and_ingredients(self):
+        """Test match=all applies to both tags and ingredients"""
+        tag = sample_tag(user=self.user)
+        ingredient1 = sample_ingredient(user=self.user, name='Salt')
+        ingredient2 = sample_ingredient(user=self.user, name='Pepper')
+        match = sample_recipe(user=self.user, title='Steak')
+        match.tags.add(tag)
+        match.ingredients.add(ingredient1, ingredient2)
+        other = sample_recipe(user=self.user, title='Fries')
+        other.tags.add(tag)
+        other.ingredients.add(ingredient1)
+
+        res = self.client.get(RECIPE_URL, {
+            'tags': str(tag.id),
+            'ingredients': f'{ingredient1.id},{ingredient2.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual([r['id'] for r in res.data['results']], [match.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test filtering with ids that are not integers is rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_filter_recipes_invalid_match(self):
+        """Test filtering with an unknown match mode is rejected"""
+        tag = sample_tag(user=self.user)
+        res = self.client.get(
+            RECIPE_URL, {'tags': str(tag.id), 'match': 'some'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('match', res.data)
+
     def test_create_basic_recipe(self):
         """Test creating recipe"""
         payload = {
@@ -163,6 +302,54 @@ class PrivateRecipeApiTest(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def _create_recipe_queries(self, ingredient_count):
+        """Create a recipe with ingredients and return the queries run"""
+        ingredients = [
+            sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            for i in range(ingredient_count)
+        ]
+        payload = {
+            'title': 'Ratatouille',
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and
+            'FROM "core_ingredient" WHERE' in query['sql']
+        ]
+
+    def test_create_recipe_validates_ingredients_in_one_query(self):
+        """Test ingredient ids are checked with a single query"""
+        self.assertEqual(len(self._create_recipe_queries(1)), 1)
+        self.assertEqual(len(self._create_recipe_queries(10)), 1)
+
+    def test_create_recipe_with_other_user_tag(self):
+        """Test recipes can not reference tags of other users"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        tag = sample_tag(user=self.user)
+        other_tag = sample_tag(user=other_user)
+        payload = {
+            'title': 'Avocado lime cheesecake',
+            'tags': [tag.id, other_tag.id, 0],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn(str(other_tag.id), res.data['tags'][0])
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch"""
         recipe = sample_recipe(user=self.user)
@@ -199,6 +386,68 @@ class PrivateRecipeApiTest(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def _link_writes(self, recipe, payload):
+        """Patch a recipe, return its link writes and the recipe locks"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json'
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = [query['sql'] for query in ctx.captured_queries]
+        return {
+            table: [
+                statement.split()[0] for statement in sql
+                if statement.startswith(('INSERT', 'DELETE')) and
+                f'"core_recipe_{table}"' in statement
+            ]
+            for table in ('tags', 'ingredients')
+        }, [
+            statement for statement in sql
+            if statement.startswith('SELECT') and
+            'FROM "core_recipe" WHERE' in statement and
+            statement.endswith('FOR UPDATE')
+        ]
+
+    def test_partial_update_diffs_links(self):
+        """Test only changed links are written, in one statement each"""
+        recipe = sample_recipe(user=self.user)
+        tags = [sample_tag(user=self.user, name=str(i)) for i in range(3)]
+        ingredient = sample_ingredient(user=self.user)
+        recipe.tags.add(*tags[:2])
+        recipe.ingredients.add(ingredient)
+
+        writes, locks = self._link_writes(recipe, {
+            'title': 'Chicken tikka', 'ingredients': [ingredient.id],
+            'tags': [tags[1].id, tags[2].id],
+        })
+
+        self.assertEqual(writes, {'tags': ['DELETE', 'INSERT'],
+                                  'ingredients': []})
+        self.assertEqual(len(locks), 1)
+        self.assertEqual(
+            set(recipe.tags.values_list('id', flat=True)),
+            {tags[1].id, tags[2].id}
+        )
+        tags[0].refresh_from_db()
+        self.assertEqual(tags[0].recipe_count, 0)
+        self.assertEqual(
+            Recipe.objects.filter(search_vector='2').get(), recipe
+        )
+
+    def test_partial_update_unchanged_links(self):
+        """Test links passed unchanged are not written"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+
+        writes, _ = self._link_writes(
+            recipe, {'title': 'Chicken tikka', 'tags': [tag.id]}
+        )
+
+        self.assertEqual(writes, {'tags': [], 'ingredients': []})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Chicken tikka')
+
 
 class RecipeImageUploadTests(TestCase):
     """Tests for uploading image for a recipe"""
@@ -213,22 +462,121 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self) -> None:
+        self.recipe.refresh_from_db()
+        for path in self.recipe.image_variants.values():
+            default_storage.delete(path)
         self.recipe.image.delete()
 
-    def test_upload_image_to_recipe(self):
-        """Test upload an image to recipe"""
+    def upload(self, image_format='JPEG', size=(10, 10), **save_kwargs):
+        """Upload a generated image to the recipe"""
         url = image_upload_url(self.recipe.id)
         with tempfile.NamedTemporaryFile(suffix='.jpeg') as ntf:
-            img = Image.new('RGB', (10, 10))
-            img.save(ntf, format='JPEG')
+            img = Image.new('RGB', size)
+            img.save(ntf, format=image_format, **save_kwargs)
             ntf.seek(0)
-            res = self.client.post(url, {'image': ntf}, format='multipart')
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
+    def test_upload_image_to_recipe(self):
+        """Test upload an image to recipe"""
+        res = self.upload()
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], ImageStatus.PENDING)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_pending_image_not_served(self):
+        """Test raw uploads are kept out of the media until processed"""
+        res = self.upload()
+
+        self.recipe.refresh_from_db()
+        self.assertIsNone(res.data['image'])
+        self.assertTrue(
+            self.recipe.image.path.startswith(settings.PENDING_IMAGE_DIR)
+        )
+        self.assertIsNone(
+            self.client.get(detail_url(self.recipe.id)).data['image']
+        )
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_upload_image_processed(self):
+        """Test uploaded images are resized and stripped of metadata"""
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera maker'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(size=(2000, 1000), exif=exif.tobytes())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        self.assertEqual(
+            self.recipe.image.name, self.recipe.image_variants['original']
+        )
+        with Image.open(self.recipe.image.path) as original:
+            self.assertEqual(original.size, (2000, 1000))
+            self.assertNotIn('exif', original.info)
+        thumbnail = self.recipe.image_variants['thumbnail']
+        with default_storage.open(thumbnail) as file:
+            self.assertEqual(Image.open(file).size, (320, 160))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data['image_status'], ImageStatus.READY)
+        self.assertIn('thumbnail', res.data['image_variants'])
+        self.assertTrue(res.data['image'].endswith(self.recipe.image.name))
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_upload_corrupt_image(self):
+        """Test images that can not be decoded are marked as failed"""
+        url = image_upload_url(self.recipe.id)
+        upload = SimpleUploadedFile('broken.jpg', b'\xff\xd8\xff' + b'0' * 64)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+
+    @override_settings(IMAGE_PROCESSING_WORKERS=0)
+    def test_upload_replaces_image_files(self):
+        """Test the previous image and its variants are deleted"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload()
+        self.recipe.refresh_from_db()
+        old_paths = [self.recipe.image.name,
+                     *self.recipe.image_variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(image_format='PNG')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        for path in old_paths:
+            self.assertFalse(default_storage.exists(path))
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+
+    def test_requeue_pending_images(self):
+        """Test images left pending by a stopped worker are processed"""
+        with self.captureOnCommitCallbacks(execute=False):
+            self.upload()
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        out = StringIO()
+        call_command('requeue_images', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        self.assertIn('1 images processed', out.getvalue())
+
+    def test_upload_not_an_image(self):
+        """Test files that are not images are rejected in the request"""
+        url = image_upload_url(self.recipe.id)
+        upload = SimpleUploadedFile('notes.jpg', b'just some text')
+        res = self.client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_upload_bad_request(self):
         """Test upload an invalid image"""
         url = image_upload_url(self.recipe.id)
@@ -254,9 +602,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -276,6 +624,6 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from recipe.tests.test_recipe_api import sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class RecipeSearchApiTest(TestCase):
+    """Test searching recipes"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, term, **params):
+        """Search recipes and return the ids of the results"""
+        res = self.client.get(RECIPE_URL, {'search': term, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_by_title(self):
+        """Test searching recipes by words of their title"""
+        curry = sample_recipe(user=self.user, title='Thai vegetable curry')
+        sample_recipe(user=self.user, title='Fish and chips')
+
+        self.assertEqual(self.search('curries'), [curry.id])
+
+    def test_search_by_tag_and_ingredient(self):
+        """Test searching recipes by tag and ingredient names"""
+        recipe = sample_recipe(user=self.user, title='Porridge')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Oats')
+        )
+        sample_recipe(user=self.user, title='Pancakes')
+
+        self.assertEqual(self.search('breakfast'), [recipe.id])
+        self.assertEqual(self.search('oats'), [recipe.id])
+
+    def test_search_follows_changes(self):
+        """Test the index follows tag renames and removed links"""
+        recipe = sample_recipe(user=self.user, title='Porridge')
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        ingredient = Ingredient.objects.create(user=self.user, name='Oats')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        tag.name = 'Brunch'
+        tag.save()
+        recipe.ingredients.remove(ingredient)
+
+        self.assertEqual(self.search('breakfast'), [])
+        self.assertEqual(self.search('brunch'), [recipe.id])
+        self.assertEqual(self.search('oats'), [])
+
+    def test_search_ranked(self):
+        """Test title matches rank above ingredient matches"""
+        by_ingredient = sample_recipe(user=self.user, title='Apple crumble')
+        by_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Butter')
+        )
+        by_title = sample_recipe(user=self.user, title='Butter chicken')
+
+        self.assertEqual(
+            self.search('butter'), [by_title.id, by_ingredient.id]
+        )
+
+    def test_search_paginated(self):
+        """Test search results can be walked page by page"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Curry number {i}')
+            for i in range(3)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'search': 'curry', 'page_size': 2})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertEqual(sorted(ids), sorted(recipe.id for recipe in recipes))
+        self.assertIsNone(res.data['next'])
+
+    def test_search_pages_with_distinct_ranks(self):
+        """Test every page of results ranked apart is walked exactly once"""
+        # The fewer matches, the lower the rank, so oldest first
+        recipes = [
+            sample_recipe(user=self.user, title=' '.join(['curry'] * (12 - i)))
+            for i in range(12)
+        ]
+
+        ids = []
+        res = self.client.get(RECIPE_URL, {'search': 'curry', 'page_size': 2})
+        for _ in range(len(recipes)):
+            ids += [recipe['id'] for recipe in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(ids, [recipe.id for recipe in recipes])
+
+    def test_search_limited_to_user(self):
+        """Test searching only returns the user's recipes"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        sample_recipe(user=other_user, title='Thai curry')
+
+        self.assertEqual(self.search('curry'), [])
@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from recipe.cache import RESPONSE_CACHE_REQUESTS
+from recipe.tests.test_recipe_api import sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+METRICS_URL = reverse('metrics')
+
+
+@override_settings(RESPONSE_CACHE_LOCAL=True)
+class ResponseCacheApiTests(TestCase):
+    """Test list responses are cached per user and version"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request does not query the database"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(RECIPE_URL)
+
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, res.data)
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    @override_settings(RESPONSE_CACHE_LOCAL=False)
+    def test_local_cache_not_used(self):
+        """Test a per process cache is not used unless allowed"""
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.has_header('X-Cache'))
+
+    def test_cached_not_modified(self):
+        """Test cached responses answer If-None-Match with a 304"""
+        etag = self.client.get(TAG_URL)['ETag']
+
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_params_normalized(self):
+        """Test the same params in another order share one entry"""
+        self.client.get(RECIPE_URL, {'tags': '1', 'page_size': 5})
+
+        res = self.client.get(f'{RECIPE_URL}?page_size=5&tags=1')
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        res = self.client.get(RECIPE_URL, {'page_size': 5})
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_writes_invalidate(self):
+        """Test creates, M2M changes and deletes bump the user's version"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        writes = (
+            lambda: sample_recipe(user=self.user, title='Another'),
+            lambda: self.recipe.tags.add(tag),
+            lambda: Ingredient.objects.create(user=self.user, name='Salt'),
+            lambda: self.recipe.delete(),
+        )
+        for write in writes:
+            self.client.get(RECIPE_URL)
+            write()
+            res = self.client.get(RECIPE_URL)
+            self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_bulk_invalidates(self):
+        """Test bulk writes bump the user's version"""
+        self.client.get(TAG_URL)
+
+        self.client.post(
+            reverse('recipe:tag-bulk'), [{'name': 'Vegan'}], format='json'
+        )
+
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_other_users_not_invalidated(self):
+        """Test writes of a user keep the cache of other users"""
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass')
+
+        sample_recipe(user=other)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_hits_and_misses_counted(self):
+        """Test the cache lookups are reported by the metrics endpoint"""
+        hits = RESPONSE_CACHE_REQUESTS.value(view='ingredient', result='hit')
+        self.client.get(INGREDIENT_URL)
+        self.client.get(INGREDIENT_URL)
+
+        self.assertEqual(
+            RESPONSE_CACHE_REQUESTS.value(view='ingredient', result='hit'),
+            hits + 1
+        )
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('response_cache_requests_total', res.data)
@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import get_response_cache
+from core.models import Tag, Ingredient, Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsApiTests(TestCase):
+    """Test ?fields= and ?expand= on the recipe endpoints"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Lime'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Lime curry', time_minutes=10,
+            price=Decimal('5.00')
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        get_response_cache().clear()
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, ' '.join(query['sql'] for query in queries)
+
+    def test_list_fields(self):
+        """Test only the asked fields are returned and read"""
+        res, sql = self.get(RECIPE_URL, {'fields': 'title,id'})
+
+        self.assertEqual(
+            res.data['results'],
+            [{'id': self.recipe.id, 'title': 'Lime curry'}]
+        )
+        self.assertNotIn('time_minutes', sql)
+        self.assertNotIn('recipe_tags', sql)
+
+    def test_list_fields_with_serializer(self):
+        """Test the serializer path returns the same fields"""
+        with self.settings(API_FAST_LISTS=False):
+            res, sql = self.get(RECIPE_URL, {'fields': 'id,price,tags'})
+
+        self.assertEqual(
+            res.data['results'],
+            [{'id': self.recipe.id, 'tags': [self.tag.id], 'price': '5.00'}]
+        )
+        self.assertNotIn('time_minutes', sql)
+        self.assertNotIn('recipe_ingredients', sql)
+
+    def test_list_expand(self):
+        """Test expanded relations are returned as objects"""
+        res, sql = self.get(
+            RECIPE_URL, {'fields': 'id,tags', 'expand': 'tags'}
+        )
+
+        self.assertEqual(
+            res.data['results'],
+            [{'id': self.recipe.id,
+              'tags': [{'id': self.tag.id, 'name': 'Vegan'}]}]
+        )
+        self.assertNotIn('recipe_ingredients', sql)
+
+    def test_list_without_params(self):
+        """Test lists without params keep returning ids"""
+        res, _ = self.get(RECIPE_URL, {})
+
+        self.assertEqual(res.data['results'][0]['tags'], [self.tag.id])
+        self.assertEqual(
+            res.data['results'][0]['ingredients'], [self.ingredient.id]
+        )
+
+    def test_retrieve_fields(self):
+        """Test a detail only reads and returns the asked fields"""
+        res, sql = self.get(
+            detail_url(self.recipe.id), {'fields': 'title,image_status'}
+        )
+
+        self.assertEqual(
+            res.data, {'title': 'Lime curry', 'image_status': 'none'}
+        )
+        self.assertNotIn('image_variants', sql)
+        self.assertNotIn('recipe_tags', sql)
+        self.assertIn('ETag', res)
+
+    def test_unknown_names(self):
+        """Test unknown fields and relations are rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,owner'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', res.data)
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import get_response_cache
+from core.models import Tag, Ingredient, Recipe
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+class RecipeStatsApiTests(TestCase):
+    """Test the recipe statistics endpoint"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_response_cache().clear()
+
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dessert = Tag.objects.create(user=self.user, name='Dessert')
+        self.lime = Ingredient.objects.create(user=self.user, name='Lime')
+        for title, minutes, price, tags in (
+            ('Lime curry', 10, '5.00', [self.vegan]),
+            ('Lime pie', 40, '8.50', [self.vegan, self.dessert]),
+            ('Cake', 60, '3.25', [self.dessert]),
+        ):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=minutes,
+                price=Decimal(price)
+            )
+            recipe.tags.add(*tags)
+            if title.startswith('Lime'):
+                recipe.ingredients.add(self.lime)
+
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'password'
+        )
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=Decimal('1.00')
+        )
+
+    def test_stats(self):
+        """Test totals and per tag and ingredient stats in one query"""
+        with self.assertNumQueries(1):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 3)
+        self.assertEqual(
+            res.data['time_minutes'], {'min': 10, 'max': 60, 'avg': 36.7}
+        )
+        self.assertEqual(
+            res.data['price'],
+            {'min': '3.25', 'max': '8.50', 'avg': '5.58'}
+        )
+        self.assertEqual(
+            [(tag['name'], tag['recipes']) for tag in res.data['tags']],
+            [('Vegan', 2), ('Dessert', 2)]
+        )
+        lime, = res.data['ingredients']
+        self.assertEqual(lime['id'], self.lime.id)
+        self.assertEqual(lime['price'], {
+            'min': '5.00', 'max': '8.50', 'avg': '6.75'
+        })
+
+    def test_stats_filtered(self):
+        """Test the stats only cover the recipes matching the filters"""
+        res = self.client.get(STATS_URL, {'tags': self.dessert.id})
+
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['ingredients'][0]['recipes'], 1)
+
+        res = self.client.get(STATS_URL, {'search': 'nothing'})
+
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertIsNone(res.data['price']['avg'])
+        self.assertEqual(res.data['tags'], [])
+
+    @override_settings(RESPONSE_CACHE_LOCAL=True)
+    def test_stats_cached_until_change(self):
+        """Test stats are served from the cache until a recipe changes"""
+        self.client.get(STATS_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(STATS_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('2')
+        )
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['recipes'], 4)
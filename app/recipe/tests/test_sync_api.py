@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChangeLog, Tag, Ingredient
+from recipe.tests.test_recipe_api import sample_recipe
+
+SYNC_URL = reverse('recipe:sync')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated sync API access"""
+
+    def test_auth_required(self):
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test delta sync of recipes, tags and ingredients"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=0, **params):
+        res = self.client.get(SYNC_URL, {'since': since, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """Test a sync without cursor returns every object"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass')
+        sample_recipe(user=other)
+
+        data = self.sync()
+
+        self.assertEqual([r['id'] for r in data['recipes']], [recipe.id])
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in data['ingredients']], [ingredient.id]
+        )
+        self.assertFalse(data['has_more'])
+
+    def test_delta_sync(self):
+        """Test only the changes after the cursor are returned"""
+        recipe = sample_recipe(user=self.user)
+        unchanged = sample_recipe(user=self.user, title='Unchanged')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        cursor = self.sync()['cursor']
+
+        recipe.title = 'Renamed'
+        recipe.save()
+        tag_id = tag.id
+        tag.delete()
+
+        # The log, the changed recipes and their tags and ingredients
+        with self.assertNumQueries(4):
+            data = self.sync(cursor)
+
+        self.assertEqual([r['title'] for r in data['recipes']], ['Renamed'])
+        self.assertNotIn(unchanged.id, [r['id'] for r in data['recipes']])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertEqual(self.sync(data['cursor'])['recipes'], [])
+
+    def test_link_changes_synced(self):
+        """Test recipes are synced when their tags change either way"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        cursor = self.sync()['cursor']
+
+        tag.recipe_set.add(recipe)
+
+        data = self.sync(cursor)
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+
+        tag_id = tag.id
+        tag.delete()
+
+        data = self.sync(data['cursor'])
+        self.assertEqual(data['recipes'][0]['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+
+    def test_bulk_writes_synced(self):
+        """Test objects written by the bulk endpoints are synced"""
+        cursor = self.sync()['cursor']
+
+        self.client.post(RECIPE_BULK_URL, [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00'}
+            for i in range(3)
+        ], format='json')
+
+        self.assertEqual(len(self.sync(cursor)['recipes']), 3)
+
+    def test_one_entry_per_object(self):
+        """Test repeated changes to an object are compacted"""
+        recipe = sample_recipe(user=self.user)
+        for minutes in range(5):
+            recipe.time_minutes = minutes
+            recipe.save()
+
+        self.assertEqual(
+            ChangeLog.objects.filter(user=self.user, model='recipe').count(), 1
+        )
+
+    @override_settings(SYNC_MAX_CHANGES=10)
+    def test_paged_sync(self):
+        """Test large syncs are split with has_more"""
+        for i in range(5):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        first = self.sync(limit=3)
+        second = self.sync(first['cursor'], limit=3)
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len(first['recipes']) + len(second['recipes']), 5)
+
+    def test_invalid_cursor(self):
+        """Test cursors must be non negative integers"""
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_user_log_removed(self):
+        """Test deleting a user removes the tombstones of its objects"""
+        sample_recipe(user=self.user)
+
+        self.user.delete()
+
+        self.assertFalse(ChangeLog.objects.exists())
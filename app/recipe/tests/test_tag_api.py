@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -45,7 +47,7 @@ class PrivateTagApiTest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tag_limited_to_authenticated_user(self):
         """Test that tag only available to the authenticated user"""
@@ -57,8 +59,8 @@ class PrivateTagApiTest(TestCase):
         res = self.client.get(TAG_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_task_successful(self):
         """Test creating a new tag"""
@@ -95,8 +97,8 @@ class PrivateTagApiTest(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -119,4 +121,53 @@ class PrivateTagApiTest(TestCase):
 
         res = self.client.get(TAG_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_tags_by_usage(self):
+        """Test ordering tags by the number of recipes using them"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Breakfast', 'Lunch', 'Dinner')
+        ]
+        for i, name in enumerate(('Pancakes', 'Porridge')):
+            recipe = Recipe.objects.create(
+                title=name, time_minutes=5, price=3.00, user=self.user
+            )
+            recipe.tags.add(*tags[i + 1:])
+
+        res = self.client.get(TAG_URL, {'ordering': 'usage', 'page_size': 2})
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']], ['Dinner', 'Lunch']
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']], ['Breakfast']
+        )
+
+    def test_retrieve_tags_paginated(self):
+        """Test walking the tag list page by page with the cursor"""
+        for name in ('Breakfast', 'Dinner', 'Lunch', 'Snack', 'Vegan'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAG_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            names += [tag['name'] for tag in res.data['results']]
+
+        self.assertEqual(
+            names, ['Vegan', 'Snack', 'Lunch', 'Dinner', 'Breakfast']
+        )
+        self.assertIsNone(res.data['next'])
+
+    @patch('recipe.pagination.BaseCursorPagination.max_page_size', 3)
+    def test_retrieve_tags_page_size_bounded(self):
+        """Test requesting a page larger than the maximum is capped"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        res = self.client.get(TAG_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIsNotNone(res.data['next'])
@@ -0,0 +1,175 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, NotFound, ValidationError
+)
+
+from core.images import (
+    EXTENSIONS, delete_image_files_on_commit, schedule_image_processing,
+    sniff_image_format
+)
+from core.models import ImageStatus, ImageUpload
+
+# Bytes read from the request body at a time
+READ_SIZE = 64 * 1024
+HEADER_SIZE = 16
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('Upload-Offset does not match the uploaded size.')
+    default_code = 'offset_conflict'
+
+
+def expiry_cutoff():
+    """Return the creation time before which uploads are abandoned"""
+    return timezone.now() - datetime.timedelta(
+        seconds=settings.CHUNKED_UPLOAD_EXPIRY
+    )
+
+
+def delete_expired_uploads():
+    """
+    Delete abandoned uploads, and partial files and chunks no upload
+    refers to
+
+    Return the number of uploads and of stray files deleted. Files are only
+    deleted once older than the expiry, uploads are created before them.
+    """
+    # post_delete removes the partial file of each upload
+    _, deleted = ImageUpload.objects.filter(
+        created_at__lt=expiry_cutoff()
+    ).delete()
+    deleted_uploads = deleted.get(ImageUpload._meta.label, 0)
+
+    deleted_files = 0
+    try:
+        names = os.listdir(settings.CHUNKED_UPLOAD_DIR)
+    except FileNotFoundError:
+        names = []
+    known = {
+        f'{pk}.part'
+        for pk in ImageUpload.objects.values_list('pk', flat=True)
+    }
+    max_mtime = time.time() - settings.CHUNKED_UPLOAD_EXPIRY
+    for name in names:
+        path = os.path.join(settings.CHUNKED_UPLOAD_DIR, name)
+        if name in known or not name.endswith(('.part', '.chunk')):
+            continue
+        try:
+            if os.path.getmtime(path) < max_mtime:
+                os.remove(path)
+                deleted_files += 1
+        except FileNotFoundError:
+            pass
+    return deleted_uploads, deleted_files
+
+
+def _read_header(path):
+    with open(path, 'rb') as file:
+        return file.read(HEADER_SIZE)
+
+
+def _receive_chunk(upload, stream, offset, chunk):
+    """Stream a request body into chunk and return its length"""
+    written = 0
+    while stream is not None:
+        block = stream.read(READ_SIZE)
+        if not block:
+            break
+        if offset + written + len(block) > upload.size:
+            raise ValidationError(_('Chunk goes past the declared size.'))
+        chunk.write(block)
+        written += len(block)
+
+        if offset == 0 and written - len(block) < HEADER_SIZE <= written:
+            chunk.flush()
+            if sniff_image_format(_read_header(chunk.name)) is None:
+                raise ValidationError(
+                    _('Upload a valid JPEG, PNG, GIF or WebP image.')
+                )
+
+    if offset == 0 < written < HEADER_SIZE < upload.size:
+        raise ValidationError(
+            _('The first chunk must hold at least %(size)d bytes.')
+            % {'size': HEADER_SIZE}
+        )
+    return written
+
+
+def append_chunk(upload, stream, offset):
+    """
+    Append a request body to the partial file of an upload
+
+    The body is streamed to a file of its own in READ_SIZE blocks first,
+    without a transaction. Only then is the upload locked, its offset
+    checked again and the chunk copied to the partial file, so a slow
+    client holds no row lock. Bytes past the stored offset, left by a chunk
+    that was interrupted, are overwritten. The first chunk must start with
+    the header of a supported image. Return the upload as updated.
+    """
+    if offset != upload.offset:
+        raise OffsetConflict()
+
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+            dir=settings.CHUNKED_UPLOAD_DIR, prefix=f'{upload.pk}.',
+            suffix='.chunk') as chunk:
+        written = _receive_chunk(upload, stream, offset, chunk)
+        chunk.flush()
+        chunk.seek(0)
+
+        with transaction.atomic():
+            upload = ImageUpload.objects.select_for_update().filter(
+                pk=upload.pk
+            ).first()
+            # Committed or deleted meanwhile, or another chunk got there
+            if upload is None:
+                raise NotFound()
+            if upload.offset != offset:
+                raise OffsetConflict()
+            with open(upload.path, 'ab') as file:
+                file.truncate(offset)
+                shutil.copyfileobj(chunk, file, READ_SIZE)
+            upload.offset = offset + written
+            upload.save(update_fields=['offset'])
+    return upload
+
+
+def commit_upload(upload):
+    """Attach a completed upload to its recipe and process it"""
+    if upload.offset != upload.size:
+        raise ValidationError(_('The upload is not complete.'))
+
+    image_format = sniff_image_format(_read_header(upload.path))
+    if image_format is None:
+        raise ValidationError(
+            _('Upload a valid JPEG, PNG, GIF or WebP image.')
+        )
+
+    recipe = upload.recipe
+    with transaction.atomic():
+        delete_image_files_on_commit(recipe)
+        with open(upload.path, 'rb') as file:
+            recipe.image.save(
+                f'upload.{EXTENSIONS[image_format]}', File(file), save=False
+            )
+        recipe.image_status = ImageStatus.PENDING
+        recipe.image_variants = {}
+        recipe.save(update_fields=[
+            'image', 'image_status', 'image_variants', 'updated_at'
+        ])
+        schedule_image_processing(recipe.pk)
+
+        upload.delete()
+    return recipe
@@ -1,29 +1,60 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Prefetch
+from django.db.models.functions import Cast
+from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core.authentication import CachedTokenAuthentication
+from core.db.pool import release_connection
+from core.db.replicas import ReplicaReadMixin
+from core.renderers import FastJSONRenderer
+from core.models import ImageUpload, Tag, Ingredient, Recipe
+from core.sync import changes_since
+from recipe import filters, serializers, uploads
+from recipe.bulk import BulkModelMixin
+from recipe.cache import CachedListMixin
+from recipe.conditional import ConditionalGetMixin
+from recipe.fast import FastListMixin
+from recipe.pagination import (
+    RecipeAttrCursorPagination, RecipeCursorPagination,
+)
+from recipe.sparse import SparseFieldsMixin
+from recipe.stats import recipe_stats
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class BaseRecipeAttrViewSet(ReplicaReadMixin, CachedListMixin,
+                            ConditionalGetMixin, FastListMixin, BulkModelMixin,
+                            viewsets.GenericViewSet, mixins.ListModelMixin,
+                            mixins.CreateModelMixin):
     """Base viewset for user own recipe"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return objects for the authenticated user only"""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            # recipe_count is kept up to date by core.counts, no join needed
+            queryset = queryset.filter(recipe_count__gt=0)
 
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        return queryset.order_by(
+            *self.paginator.get_ordering(self.request, queryset, self)
+        )
 
     def perform_create(self, serializer):
         """Create new tag"""
@@ -34,25 +65,49 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    bulk_serializer_class = serializers.TagBulkSerializer
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    bulk_serializer_class = serializers.IngredientBulkSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, CachedListMixin, ConditionalGetMixin,
+                    SparseFieldsMixin, FastListMixin, BulkModelMixin,
+                    viewsets.ModelViewSet):
     """Manage recipe in the database"""
     serializer_class = serializers.RecipeSerializer
+    bulk_serializer_class = serializers.RecipeBulkSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+    pagination_class = RecipeCursorPagination
+    prefetch_actions = ('list', 'retrieve', 'update', 'partial_update', 'bulk')
+    lock_actions = ('update', 'partial_update')
 
     @staticmethod
-    def _params_to_ints(qs):
+    def _params_to_ints(qs, param):
         """Convert a list of string IDS to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError({
+                param: _('Expected a comma separated list of integers')
+            })
+
+    def _get_match(self):
+        """Return how tags and ingredients filters are combined"""
+        match = self.request.query_params.get('match', filters.MATCH_ANY)
+        if match not in filters.MATCH_MODES:
+            raise ValidationError({
+                'match': _('Expected one of: %s')
+                % ', '.join(filters.MATCH_MODES)
+            })
+        return match
 
     def get_queryset(self):
         """Retrieve the recipe for authenticated user"""
@@ -61,14 +116,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = filters.filter_by_related(
+                queryset, 'tags', tag_ids, self._get_match()
+            )
 
         if ingredients:
-            ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            ingredients_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = filters.filter_by_related(
+                queryset, 'ingredients', ingredients_ids, self._get_match()
+            )
+
+        search = self.request.query_params.get('search')
+        if search:
+            query = SearchQuery(
+                search, config=settings.SEARCH_CONFIG, search_type='websearch'
+            )
+            # The rank is a float4, which the cursor can not write down
+            # exactly, so its position would point back into the page.
+            # Numeric values round trip, ties are left to the id.
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=Cast(
+                    SearchRank(F('search_vector'), query),
+                    DecimalField(max_digits=12, decimal_places=8)
+                )
+            )
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+
+        if self.action in self.prefetch_actions:
+            # Load every recipe's tags and ingredients in one query per
+            # relation instead of one query per recipe in the serializer,
+            # in the pk order recipe.fast lists them in. Relations left out
+            # by ?fields= are not loaded at all
+            queryset = queryset.prefetch_related(*(
+                Prefetch(name, queryset=model.objects.order_by('pk'))
+                for name, model in (('tags', Tag), ('ingredients', Ingredient))
+                if self.get_requested(name)
+            ))
+
+        if self.action in self.lock_actions:
+            # Read under a lock, concurrent updates can not then overwrite
+            # each other's fields or diff against stale links
+            queryset = queryset.select_for_update()
 
-        return queryset.filter(user=self.request.user)
+        fields = self.get_fieldset().get('fields')
+        if fields is not None:
+            # The validators of ConditionalGetMixin read updated_at
+            columns = {field.name for field in Recipe._meta.concrete_fields}
+            queryset = queryset.only(
+                'updated_at', *(name for name in fields if name in columns)
+            )
+
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -76,7 +176,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
-        return serializers.RecipeSerializer
+        return super().get_serializer_class()
+
+    def update(self, request, *args, **kwargs):
+        """Update a recipe, locked until the transaction commits"""
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """Create a new recipe"""
@@ -84,7 +189,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Upload an image to a recipe, it is processed in the background"""
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
@@ -95,10 +200,135 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
             )
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return counts, times and prices of the filtered recipes"""
+        return self.cached_response(
+            request,
+            lambda: Response(
+                recipe_stats(self.filter_queryset(self.get_queryset()))
+            )
+        )
+
+
+class ImageUploadViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin, mixins.DestroyModelMixin):
+    """
+    Upload recipe images in resumable chunks
+
+    POST creates an upload for a recipe with the total size of the image.
+    Each PATCH appends its raw body at the Upload-Offset header, GET returns
+    the offset to resume from and POST to commit/ attaches the image.
+    """
+    serializer_class = serializers.ImageUploadSerializer
+    queryset = ImageUpload.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """Retrieve the unexpired uploads of the authenticated user"""
+        return self.queryset.filter(
+            user=self.request.user, created_at__gte=uploads.expiry_cutoff()
+        )
+
+    def perform_create(self, serializer):
+        """Create a new upload"""
+        serializer.save(user=self.request.user)
+
+    def partial_update(self, request, pk=None):
+        """Append a chunk to the upload"""
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            raise ValidationError({
+                'Upload-Offset': _('Expected the byte offset of the chunk.')
+            })
+
+        upload = self.get_object()
+        # Nothing is locked while the chunk arrives, the connection can go
+        # back to the pool until then
+        release_connection(connection)
+        upload = uploads.append_chunk(upload, request.stream, offset)
+
+        return Response(
+            self.get_serializer(upload).data,
+            headers={'Upload-Offset': str(upload.offset)}
+        )
+
+    @action(methods=['POST'], detail=True)
+    def commit(self, request, pk=None):
+        """Attach the completed upload to its recipe"""
+        # Locked, a concurrent commit of the upload then finds it deleted
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=pk
+            )
+            recipe = uploads.commit_upload(upload)
+        serializer = serializers.RecipeImageSerializer(
+            recipe, context=self.get_serializer_context()
+        )
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class SyncView(ReplicaReadMixin, APIView):
+    """
+    Return the changes to the user's recipes, tags and ingredients
+
+    since is the cursor returned by the previous sync, or 0 for a full one.
+    Changed objects are returned with their current state and deleted ones
+    by id. Clients call again with the new cursor while has_more is set.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    sync_models = (
+        ('recipes', Recipe, serializers.RecipeSerializer),
+        ('tags', Tag, serializers.TagSerializer),
+        ('ingredients', Ingredient, serializers.IngredientSerializer),
+    )
+
+    def get(self, request):
+        params = serializers.SyncQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data['since']
+        limit = params.validated_data['limit']
+
+        entries = changes_since(request.user.pk, since, limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        data = {
+            'cursor': entries[-1].seq if entries else since,
+            'has_more': has_more,
+            'deleted': {},
+        }
+
+        for key, model, serializer_class in self.sync_models:
+            label = model._meta.model_name
+            changed = [
+                entry.object_id for entry in entries
+                if entry.model == label and not entry.deleted
+            ]
+            data['deleted'][key] = [
+                entry.object_id for entry in entries
+                if entry.model == label and entry.deleted
+            ]
+
+            objects = []
+            if changed:
+                objects = model.objects.filter(
+                    user=request.user, pk__in=changed
+                ).order_by('pk')
+                if model is Recipe:
+                    objects = objects.prefetch_related('tags', 'ingredients')
+            data[key] = serializer_class(
+                objects, many=True, context={'request': request}
+            ).data
+
+        return Response(data)